@@ -0,0 +1,62 @@
+# bench_database.py - Database operations at 10k/100k rows
+import os
+import random
+
+from common import load_main, percentiles, workdir, Timer
+
+
+def _bench_size(main, rows):
+    # On disk like production, every write commits
+    db = main.Database(os.path.join(workdir('database'), f'bench_{rows}.db'))
+    users = rows // 10
+    results = {}
+    
+    with Timer() as t:
+        for user_id in range(users):
+            db.add_user(user_id, f'user{user_id}', 'Bench')
+    results['add_user_per_sec'] = users / t.seconds
+    
+    with Timer() as t:
+        for i in range(rows):
+            db.add_hosted_bot(f'bot{i}', i % users, f'bot{i}.py', 'python', f'/bots/{i % users}/bot{i}/bot{i}.py')
+    results['add_hosted_bot_per_sec'] = rows / t.seconds
+    
+    lookups = [f'bot{random.randrange(rows)}' for _ in range(2000)]
+    samples = []
+    for bot_id in lookups:
+        with Timer() as t:
+            db.get_bot(bot_id)
+        samples.append(t.seconds * 1000)
+    results.update(percentiles(samples, 'get_bot'))
+    
+    samples = []
+    for _ in range(200):
+        user_id = random.randrange(users)
+        with Timer() as t:
+            db.get_user_bots(user_id)
+        samples.append(t.seconds * 1000)
+    results.update(percentiles(samples, 'get_user_bots'))
+    
+    samples = []
+    for bot_id in lookups[:1000]:
+        with Timer() as t:
+            db.update_bot_status(bot_id, 'running', 4242)
+        samples.append(t.seconds * 1000)
+    results.update(percentiles(samples, 'update_bot_status'))
+    
+    samples = []
+    for _ in range(20):
+        with Timer() as t:
+            db.get_bots_by_status('running', 'hibernated')
+        samples.append(t.seconds * 1000)
+    results.update(percentiles(samples, 'get_bots_by_status'))
+    
+    return {f'rows{rows}_{key}': value for key, value in results.items()}
+
+
+def run(quick=False):
+    main = load_main()
+    results = {}
+    for rows in ([1000] if quick else [10000, 100000]):
+        results.update(_bench_size(main, rows))
+    return results
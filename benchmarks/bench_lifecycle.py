@@ -0,0 +1,64 @@
+# bench_lifecycle.py - start_bot/stop_bot latency and monitor overhead with many dummy bots
+import os
+
+from common import load_main, percentiles, workdir, Timer
+
+DUMMY_BOT = '''
+import time
+while True:
+    time.sleep(60)
+'''
+
+
+def run(quick=False):
+    main = load_main()
+    bots = 20 if quick else 200
+    base = workdir('lifecycle')
+    bot_path = os.path.join(base, 'dummy.py')
+    with open(bot_path, 'w') as f:
+        f.write(DUMMY_BOT)
+    
+    manager = main.BotManager(main.Database(os.path.join(base, 'lifecycle.db')))
+    bot_ids = [f'dummy{i}' for i in range(bots)]
+    results = {'bots': bots}
+    
+    try:
+        samples = []
+        for bot_id in bot_ids:
+            with Timer() as t:
+                manager.start_bot(bot_id, bot_path, 'python')
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, 'start_bot'))
+        
+        # One monitor pass is a resource sample plus a liveness poll of every bot
+        samples = []
+        for _ in range(10):
+            with Timer() as t:
+                manager.sample_resources()
+                for info in list(manager.processes.values()):
+                    info['process'].poll()
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, 'monitor_pass'))
+        
+        samples = []
+        for bot_id in bot_ids[:10]:
+            with Timer() as t:
+                manager.get_bot_stats(bot_id)
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, 'get_bot_stats'))
+        
+        half = bots // 2
+        samples = []
+        for bot_id in bot_ids[:half]:
+            with Timer() as t:
+                manager.stop_bot(bot_id)
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, 'stop_bot'))
+        
+        with Timer() as t:
+            manager.stop_bots(bot_ids[half:])
+        results[f'stop_bots_{bots - half}_ms'] = t.seconds * 1000
+    finally:
+        manager.stop_bots(list(manager.processes))
+    
+    return results
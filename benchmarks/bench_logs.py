@@ -0,0 +1,60 @@
+# bench_logs.py - Log capture, archive indexing and search from chatty bots
+import os
+import random
+import time
+
+from common import load_main, percentiles, workdir, Timer
+
+CHATTY_BOT = '''
+import sys
+for i in range({lines}):
+    print(f"INFO update {{i}} handled in 3ms chat_id=123456789 user=someone text=hello world")
+print("DONE", flush=True)
+'''
+
+
+def run(quick=False):
+    main = load_main()
+    bots = 2 if quick else 10
+    lines = 10000 if quick else 100000
+    base = workdir('logs')
+    bot_path = os.path.join(base, 'chatty.py')
+    with open(bot_path, 'w') as f:
+        f.write(CHATTY_BOT.format(lines=lines))
+
+    manager = main.BotManager(main.Database(os.path.join(base, 'logs.db')))
+    bot_ids = [f'chatty{i}' for i in range(bots)]
+    captured = set()
+
+    try:
+        with Timer() as t:
+            for bot_id in bot_ids:
+                manager.start_bot(bot_id, bot_path, 'python')
+            # Lines are flushed in order, so a searchable final line means the whole run is archived
+            deadline = time.monotonic() + 300
+            while len(captured) < bots and time.monotonic() < deadline:
+                for bot_id in bot_ids:
+                    if bot_id not in captured and manager.search_logs(bot_id, 'DONE', 1):
+                        captured.add(bot_id)
+                time.sleep(0.05)
+    finally:
+        manager.stop_bots(list(manager.processes))
+
+    samples = []
+    for _ in range(200):
+        bot_id = random.choice(bot_ids)
+        with Timer() as search:
+            manager.search_logs(bot_id, f'update {random.randrange(lines)}', 20)
+        samples.append(search.seconds * 1000)
+
+    archive = manager.logs.stats()
+    return {
+        'bots': bots,
+        'lines_per_bot': lines,
+        'bots_fully_captured': len(captured),
+        'capture_seconds': t.seconds,
+        'capture_lines_per_sec': len(captured) * (lines + 1) / t.seconds,
+        'archive_mb': archive['bytes'] / 1024 / 1024,
+        'compression_ratio': archive['raw_bytes'] / archive['bytes'] if archive['bytes'] else 0,
+        **percentiles(samples, 'search')
+    }
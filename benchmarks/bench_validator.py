@@ -0,0 +1,83 @@
+# bench_validator.py - CodeValidator throughput on large Python files and ZIP projects
+import os
+import shutil
+import zipfile
+
+from common import load_main, percentiles, workdir, Timer
+
+FUNCTION_TEMPLATE = '''
+import json
+from telegram import Update
+
+async def handler_{i}(update: Update, context):
+    """Generated handler {i}"""
+    data = {{'id': {i}, 'items': [x * 2 for x in range(10)]}}
+    if update.message and update.message.text == '/cmd{i}':
+        await update.message.reply_text(json.dumps(data))
+    return data
+'''
+
+
+def _python_source(size_kb):
+    chunks, size, i = [], 0, 0
+    while size < size_kb * 1024:
+        chunk = FUNCTION_TEMPLATE.format(i=i)
+        chunks.append(chunk)
+        size += len(chunk)
+        i += 1
+    return ''.join(chunks)
+
+
+def _zip_project(path, files, size_kb):
+    source = _python_source(size_kb)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('main.py', source)
+        for i in range(files - 1):
+            zf.writestr(f'pkg/module_{i}.py', source)
+
+
+def run(quick=False):
+    main = load_main()
+    validator = main.CodeValidator()
+    results = {}
+    
+    for size_kb in ([256] if quick else [256, 2048]):
+        code = _python_source(size_kb)
+        samples = []
+        for _ in range(3 if quick else 5):
+            with Timer() as t:
+                validator.validate_python_code(code)
+                validator.extract_requirements(code)
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, f'python_{size_kb}kb'))
+        results[f'python_{size_kb}kb_mb_per_sec'] = size_kb / 1024 / (min(samples) / 1000)
+    
+    # Same steps as handle_file_upload: extract, then validate every Python file
+    base = workdir('validator')
+    files = 20 if quick else 200
+    archive = os.path.join(base, 'project.zip')
+    _zip_project(archive, files, 16)
+    samples = []
+    for _ in range(3):
+        target = os.path.join(base, 'project')
+        shutil.rmtree(target, ignore_errors=True)
+        with Timer() as t:
+            with zipfile.ZipFile(archive) as zf:
+                zf.extractall(target)
+            for root, _, names in os.walk(target):
+                for name in names:
+                    with open(os.path.join(root, name)) as f:
+                        validator.validate_python_code(f.read())
+        samples.append(t.seconds * 1000)
+    results.update(percentiles(samples, f'zip_{files}_files'))
+    results[f'zip_{files}_files_files_per_sec'] = files / (min(samples) / 1000)
+    
+    if shutil.which('node'):
+        samples = []
+        for _ in range(5):
+            with Timer() as t:
+                validator.validate_javascript_code('const x = 1;\n' * 1000)
+            samples.append(t.seconds * 1000)
+        results.update(percentiles(samples, 'javascript_check'))
+    
+    return results
@@ -0,0 +1,105 @@
+# bench_zygote.py - Cold-start latency and memory: plain exec vs zygote fork
+#   python3 benchmarks/bench_zygote.py [--bots 100] [--output results.json]
+import os
+import json
+import time
+import argparse
+
+from common import load_main, percentiles, workdir
+
+BOT_TEMPLATE = '''
+import time
+{imports}
+print("ready", flush=True)
+while True:
+    time.sleep(60)
+'''
+
+
+def _memory_mb(pids):
+    """Total RSS and PSS (shared pages split between sharers) across processes"""
+    import psutil
+    rss = pss = 0
+    for pid in pids:
+        try:
+            info = psutil.Process(pid).memory_full_info()
+        except psutil.Error:
+            continue
+        rss += info.rss
+        pss += getattr(info, 'pss', info.rss)
+    return rss / 1024 / 1024, pss / 1024 / 1024
+
+
+def _wait_ready(manager, bot_id, timeout=60):
+    """Output is consumed by the log archive, so readiness shows up in its tail"""
+    deadline = time.monotonic() + timeout
+    while 'ready' not in manager.logs.tail(bot_id, 5):
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f'{bot_id} never printed ready')
+        time.sleep(0.001)
+
+
+def _measure(main, base, bots, use_zygote):
+    main.Config.ZYGOTE_ENABLED = use_zygote
+    manager = main.BotManager(main.Database(':memory:'))
+    bot_path = os.path.join(base, 'bot.py')
+    prefix = 'zygote' if use_zygote else 'spawn'
+    latencies = []
+    try:
+        for i in range(bots):
+            # Ids differ per mode so one run's archived output never satisfies the other's wait
+            bot_id = f'{prefix}{i}'
+            started = time.perf_counter()
+            result = manager.start_bot(bot_id, bot_path, 'python')
+            if not result['success']:
+                raise RuntimeError(result['message'])
+            _wait_ready(manager, bot_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        pids = [info['process'].pid for info in manager.processes.values()]
+        if manager.zygote:
+            pids.append(manager.zygote.server.pid)
+        rss, pss = _memory_mb(pids)
+    finally:
+        manager.stop_bots(list(manager.processes))
+        if manager.zygote:
+            manager.zygote.shutdown()
+    results = percentiles(latencies, f'{prefix}_start')
+    results[f'{prefix}_total_rss_mb'] = rss
+    results[f'{prefix}_total_pss_mb'] = pss
+    return results
+
+
+def run(quick=False, bots=None):
+    main = load_main()
+    bots = bots or (10 if quick else 100)
+    base = workdir('zygote')
+    
+    imports = []
+    for name in main.Config.ZYGOTE_PRELOAD:
+        try:
+            __import__(name)
+            imports.append(f'import {name}')
+        except ImportError:
+            pass
+    with open(os.path.join(base, 'bot.py'), 'w') as f:
+        f.write(BOT_TEMPLATE.format(imports='\n'.join(imports)))
+    
+    main.Config.ZYGOTE_SOCKET = os.path.join(base, 'zygote.sock')
+    main.Config.LOG_POLL_SECONDS = 0.001  # Spools are polled, keep that out of the start-to-ready time
+    results = {'bots': bots}
+    results.update(_measure(main, base, bots, use_zygote=False))
+    results.update(_measure(main, base, bots, use_zygote=True))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cold-start latency and memory: plain exec vs zygote fork')
+    parser.add_argument('--bots', type=int, default=100)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    results = json.dumps(run(bots=args.bots), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(results)
+    print(results)
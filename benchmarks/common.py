@@ -0,0 +1,46 @@
+# common.py - Shared benchmark helpers
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_main = None
+
+
+def load_main():
+    """Import main.py from a scratch directory so its database and bot files never touch the repo"""
+    global _main
+    if _main is None:
+        os.chdir(tempfile.mkdtemp(prefix='bench_'))
+        sys.path.insert(0, ROOT)
+        import main
+        _main = main
+    return _main
+
+
+def workdir(name):
+    path = os.path.join(os.getcwd(), name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def percentiles(samples_ms, prefix):
+    """p50/p95/max of a list of millisecond samples as flat metrics"""
+    samples = sorted(samples_ms)
+    return {
+        f'{prefix}_p50_ms': samples[len(samples) // 2],
+        f'{prefix}_p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        f'{prefix}_max_ms': samples[-1],
+        f'{prefix}_mean_ms': statistics.mean(samples)
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
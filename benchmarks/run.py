@@ -0,0 +1,98 @@
+# run.py - Control-plane benchmark suite
+#   python3 benchmarks/run.py [--quick] [--suite database ...] [--output results.json]
+#                             [--compare baseline.json] [--threshold 10]
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import subprocess
+
+from common import ROOT
+
+SUITES = ['database', 'validator', 'lifecycle', 'logs', 'zygote']
+
+# Metric names end with their unit, which says which direction is better
+HIGHER_IS_BETTER = ('_per_sec',)
+LOWER_IS_BETTER = ('_ms', '_mb', '_seconds')
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Per-metric change against a baseline run, flagging regressions beyond threshold percent"""
+    rows = []
+    for suite, metrics in current['results'].items():
+        for name, value in metrics.items():
+            old = baseline.get('results', {}).get(suite, {}).get(name)
+            if not isinstance(old, (int, float)) or not old:
+                continue
+            if name.endswith(HIGHER_IS_BETTER):
+                change = (old - value) / old * 100
+            elif name.endswith(LOWER_IS_BETTER):
+                change = (value - old) / old * 100
+            else:
+                continue
+            rows.append({'metric': f'{suite}.{name}', 'baseline': old, 'current': value,
+                         'worse_percent': change, 'regression': change > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Control-plane benchmark suite')
+    parser.add_argument('--suite', action='append', choices=SUITES)
+    parser.add_argument('--quick', action='store_true', help='small sizes for a smoke run')
+    parser.add_argument('--output')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=10, help='percent worse counted as a regression')
+    args = parser.parse_args()
+    
+    report = {
+        'meta': {
+            'revision': _git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': args.quick
+        },
+        'results': {}
+    }
+    
+    for suite in args.suite or SUITES:
+        print(f"⏱ {suite}...", file=sys.stderr)
+        module = importlib.import_module(f'bench_{suite}')
+        started = time.perf_counter()
+        report['results'][suite] = module.run(quick=args.quick)
+        print(f"   done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report, args.threshold)
+        report['comparison'] = rows
+        for row in rows:
+            flag = '❌' if row['regression'] else '  '
+            print(f"{flag} {row['metric']}: {row['baseline']:.3f} -> {row['current']:.3f} "
+                  f"({row['worse_percent']:+.1f}% worse)", file=sys.stderr)
+        if any(row['regression'] for row in rows):
+            exit_code = 1
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
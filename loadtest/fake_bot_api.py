@@ -0,0 +1,226 @@
+# fake_bot_api.py - Local Telegram Bot API stand-in
+#   python3 loadtest/fake_bot_api.py [--port 8081]
+#   BOT_API_BASE_URL=http://127.0.0.1:8081/bot BOT_API_FILE_URL=http://127.0.0.1:8081/file/bot python3 main.py
+#
+# Implements the methods main.py uses: getMe, deleteWebhook, getUpdates, sendMessage,
+# editMessageText, answerCallbackQuery, getFile and file downloads. Updates are injected
+# through POST /_control/updates (the load generator does this in-process).
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Fake Hosting Bot', 'username': 'fake_hosting_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+
+# Form fields PTB sends as numbers, everything else stays a string unless it is JSON
+NUMERIC_FIELDS = {'chat_id', 'message_id', 'offset', 'limit', 'timeout'}
+
+
+class FakeBotAPI:
+    """In-memory Bot API: an update queue for getUpdates and a record of every bot call"""
+    
+    def __init__(self):
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.files = {}
+        self.callback_chats = {}
+        self.unknown_methods = {}
+        self.listeners = []
+        self.polling = threading.Event()
+        self.cond = threading.Condition()
+    
+    def _message_id(self):
+        with self.cond:
+            self.next_message_id += 1
+            return self.next_message_id
+    
+    # Injection side
+    
+    def add_file(self, file_id, content):
+        self.files[file_id] = content
+    
+    def push_update(self, update):
+        """Queue an update for getUpdates, returns its update_id"""
+        with self.cond:
+            update = dict(update, update_id=self.next_update_id)
+            self.next_update_id += 1
+            if 'callback_query' in update:
+                self.callback_chats[update['callback_query']['id']] = update['callback_query']['from']['id']
+            self.updates.append(update)
+            self.cond.notify_all()
+            return update['update_id']
+    
+    def user_message(self, user, text=None, document=None):
+        message = {
+            'message_id': self._message_id(),
+            'date': int(time.time()),
+            'chat': {'id': user['id'], 'type': 'private', 'first_name': user['first_name']},
+            'from': user
+        }
+        if text is not None:
+            message['text'] = text
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        if document is not None:
+            message['document'] = document
+        return self.push_update({'message': message})
+    
+    def callback_query(self, user, message, data):
+        return self.push_update({'callback_query': {
+            'id': f"{user['id']}-{self._message_id()}",
+            'from': user,
+            'chat_instance': str(user['id']),
+            'message': message,
+            'data': data
+        }})
+    
+    # Bot API side
+    
+    def _bot_message(self, chat_id, text, reply_markup=None, message_id=None):
+        message = {
+            'message_id': message_id or self._message_id(),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text
+        }
+        if reply_markup and 'inline_keyboard' in reply_markup:
+            message['reply_markup'] = reply_markup
+        return message
+    
+    def _record(self, method, chat_id, result):
+        for listener in list(self.listeners):
+            listener(method, chat_id, result)
+    
+    def call(self, method, params):
+        if method == 'getMe':
+            return BOT_USER
+        if method in ('deleteWebhook', 'setMyCommands', 'close'):
+            return True
+        if method == 'getUpdates':
+            self.polling.set()
+            offset = params.get('offset', 0)
+            timeout = params.get('timeout', 0)
+            limit = params.get('limit', 100)
+            deadline = time.monotonic() + timeout
+            with self.cond:
+                self.updates = [u for u in self.updates if u['update_id'] >= offset]
+                while not self.updates and time.monotonic() < deadline:
+                    self.cond.wait(deadline - time.monotonic())
+                return self.updates[:limit]
+        if method == 'sendMessage':
+            message = self._bot_message(params['chat_id'], params.get('text', ''), params.get('reply_markup'))
+            self._record(method, params['chat_id'], message)
+            return message
+        if method == 'editMessageText':
+            message = self._bot_message(params['chat_id'], params.get('text', ''), params.get('reply_markup'),
+                                        message_id=params.get('message_id'))
+            self._record(method, params['chat_id'], message)
+            return message
+        if method == 'answerCallbackQuery':
+            self._record(method, self.callback_chats.pop(params['callback_query_id'], None), True)
+            return True
+        if method == 'getFile':
+            file_id = params['file_id']
+            if file_id not in self.files:
+                raise KeyError('Bad Request: invalid file_id')
+            return {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(self.files[file_id]),
+                    'file_path': f'documents/{file_id}'}
+        self.unknown_methods[method] = self.unknown_methods.get(method, 0) + 1
+        return True
+    
+    def serve(self, host='127.0.0.1', port=8081):
+        """Start the HTTP server on a background thread, returns the server"""
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def _params(self):
+                url = urlparse(self.path)
+                raw = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json') and body:
+                    return url.path, json.loads(body)
+                raw.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+                params = {}
+                for key, value in raw.items():
+                    if key in NUMERIC_FIELDS and value.lstrip('-').isdigit():
+                        params[key] = int(value)
+                    elif value[:1] in '{[':
+                        params[key] = json.loads(value)
+                    else:
+                        params[key] = value
+                return url.path, params
+            
+            def _reply(self, code, body, content_type='application/json'):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _dispatch(self):
+                path, params = self._params()
+                parts = [p for p in path.split('/') if p]
+                if parts[:1] == ['_control']:
+                    return self._control(parts[1:], params)
+                if parts[:1] == ['file'] and len(parts) >= 3:
+                    file_id = parts[-1]
+                    if file_id in api.files:
+                        return self._reply(200, api.files[file_id], 'application/octet-stream')
+                    return self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                if len(parts) != 2 or not parts[0].startswith('bot'):
+                    return self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                try:
+                    return self._reply(200, {'ok': True, 'result': api.call(parts[1], params)})
+                except KeyError as e:
+                    return self._reply(400, {'ok': False, 'error_code': 400, 'description': str(e).strip("'")})
+            
+            def _control(self, parts, params):
+                if parts == ['updates']:
+                    return self._reply(200, {'update_id': api.push_update(params)})
+                if parts == ['files']:
+                    api.add_file(params['file_id'], base64.b64decode(params['content']))
+                    return self._reply(200, {'ok': True})
+                if parts == ['stats']:
+                    return self._reply(200, {'queued': len(api.updates), 'unknown_methods': api.unknown_methods})
+                return self._reply(404, {'ok': False})
+            
+            def do_GET(self):
+                self._dispatch()
+            
+            def do_POST(self):
+                self._dispatch()
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Telegram Bot API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    args = parser.parse_args()
+    
+    FakeBotAPI().serve(args.host, args.port)
+    print(f"🧪 Fake Bot API on http://{args.host}:{args.port}/bot<token>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
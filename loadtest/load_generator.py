@@ -0,0 +1,187 @@
+# load_generator.py - Simulated users driving main.py through the fake Bot API
+#   python3 loadtest/load_generator.py [--users 1000] [--concurrency 200] [--output report.json]
+#
+# Starts the fake Bot API in-process, launches main.py against it from a scratch directory
+# (unless --no-spawn) and runs every user through: /start, upload a bot, open it, tap Stats,
+# /install a module, /mybots. Latency is measured per handler from injecting the update to
+# the bot's final reply for that chat.
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+from fake_bot_api import FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_FILE_ID = 'loadtest-bot-file'
+UPLOAD_SOURCE = b'''import time
+import requests
+
+while True:
+    time.sleep(60)
+'''
+BOT_ID_PATTERN = re.compile(r'Bot ID:\*\* `([0-9a-f]{8})`')
+
+
+class SimulatedUsers:
+    def __init__(self, api, args):
+        self.api = api
+        self.args = args
+        self.loop = asyncio.get_running_loop()
+        self.inboxes = {}
+        self.samples = {}
+        api.listeners.append(self._on_bot_call)
+    
+    def _on_bot_call(self, method, chat_id, result):
+        inbox = self.inboxes.get(chat_id)
+        if inbox:
+            self.loop.call_soon_threadsafe(inbox.put_nowait, (time.perf_counter(), method, result))
+    
+    async def _act(self, handler, user, inject, done):
+        """Inject one update and wait until a bot call for this chat satisfies done(method, result)"""
+        inbox = self.inboxes[user['id']]
+        while not inbox.empty():
+            inbox.get_nowait()
+        started = time.perf_counter()
+        inject()
+        first = None
+        sample = self.samples.setdefault(handler, {'first': [], 'done': [], 'errors': 0})
+        deadline = started + self.args.action_timeout
+        while True:
+            try:
+                at, method, result = await asyncio.wait_for(inbox.get(), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                sample['errors'] += 1
+                return None
+            if first is None:
+                first = at
+                sample['first'].append((first - started) * 1000)
+            if done(method, result):
+                sample['done'].append((at - started) * 1000)
+                return result
+    
+    async def run_user(self, index):
+        user = {'id': 5_000_000 + index, 'is_bot': False, 'first_name': f'Load{index}'}
+        self.inboxes[user['id']] = asyncio.Queue()
+        api = self.api
+        
+        def text_reply(method, result):
+            return method == 'sendMessage'
+        
+        def edit_reply(method, result):
+            return method == 'editMessageText'
+        
+        await self._act('start_command', user, lambda: api.user_message(user, '/start'), text_reply)
+        
+        document = {'file_id': UPLOAD_FILE_ID, 'file_unique_id': UPLOAD_FILE_ID, 'file_name': 'bot.py',
+                    'file_size': len(UPLOAD_SOURCE)}
+        uploaded = await self._act(
+            'handle_file_upload', user, lambda: api.user_message(user, document=document),
+            lambda method, result: method == 'editMessageText' and re.search(r'Bot ID|FAILED|error', result['text'])
+        )
+        match = BOT_ID_PATTERN.search(uploaded['text']) if uploaded else None
+        if match:
+            bot_id = match.group(1)
+            opened = await self._act('callback_handler:bot', user,
+                                     lambda: api.callback_query(user, uploaded, f'bot_{bot_id}'), edit_reply)
+            await self._act('callback_handler:stats', user,
+                            lambda: api.callback_query(user, opened or uploaded, f'stats_{bot_id}'), edit_reply)
+            await self._act('install_module_command', user,
+                            lambda: api.user_message(user, f'/install {bot_id} {self.args.module}'), edit_reply)
+        
+        await self._act('my_bots_command', user, lambda: api.user_message(user, '/mybots'), text_reply)
+        del self.inboxes[user['id']]
+    
+    async def run(self):
+        gate = asyncio.Semaphore(self.args.concurrency)
+        
+        async def guarded(index):
+            async with gate:
+                await self.run_user(index)
+        
+        await asyncio.gather(*(guarded(i) for i in range(self.args.users)))
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+
+
+def report(samples, seconds, users):
+    handlers = {}
+    for handler, sample in samples.items():
+        done = sorted(sample['done'])
+        first = sorted(sample['first'])
+        handlers[handler] = {
+            'count': len(done),
+            'errors': sample['errors'],
+            'first_reply_p50_ms': percentile(first, 0.5),
+            'p50_ms': percentile(done, 0.5),
+            'p90_ms': percentile(done, 0.9),
+            'p99_ms': percentile(done, 0.99),
+            'max_ms': done[-1] if done else None
+        }
+    actions = sum(h['count'] for h in handlers.values())
+    return {'users': users, 'seconds': seconds, 'actions_per_sec': actions / seconds, 'handlers': handlers}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Load generator for the hosting bot')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200, help='users active at the same time')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--module', default='requests', help='module passed to /install')
+    parser.add_argument('--action-timeout', type=float, default=120)
+    parser.add_argument('--no-spawn', action='store_true', help='main.py is already running against the fake API')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    api = FakeBotAPI()
+    api.add_file(UPLOAD_FILE_ID, UPLOAD_SOURCE)
+    server = api.serve(port=args.port)
+    
+    platform = None
+    if not args.no_spawn:
+        workdir = tempfile.mkdtemp(prefix='loadtest_')
+        env = dict(os.environ,
+                   BOT_TOKEN='123456:LOADTEST',
+                   BOT_API_BASE_URL=f'http://127.0.0.1:{args.port}/bot',
+                   BOT_API_FILE_URL=f'http://127.0.0.1:{args.port}/file/bot')
+        log = open(os.path.join(workdir, 'platform.log'), 'w')
+        platform = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir, env=env,
+                                    stdout=log, stderr=subprocess.STDOUT)
+        print(f"🚀 Platform started in {workdir}", file=sys.stderr)
+    
+    try:
+        if not await asyncio.get_running_loop().run_in_executor(None, api.polling.wait, 60):
+            raise SystemExit('❌ Platform never started polling the fake Bot API')
+        
+        users = SimulatedUsers(api, args)
+        started = time.perf_counter()
+        await users.run()
+        result = report(users.samples, time.perf_counter() - started, args.users)
+    finally:
+        if platform:
+            platform.terminate()
+            platform.wait()
+        server.shutdown()
+    
+    print(f"{'handler':<28}{'count':>7}{'err':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)", file=sys.stderr)
+    for handler, h in result['handlers'].items():
+        cells = [f"{h[k]:>9.0f}" if h[k] is not None else f"{'-':>9}" for k in ('p50_ms', 'p90_ms', 'p99_ms', 'max_ms')]
+        print(f"{handler:<28}{h['count']:>7}{h['errors']:>5}{''.join(cells)}", file=sys.stderr)
+    print(f"⚡ {result['actions_per_sec']:.1f} actions/s over {result['seconds']:.1f}s", file=sys.stderr)
+    
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
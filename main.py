@@ -6,7 +6,9 @@ from datetime import datetime
 import hashlib
 
 class Config:
-    BOT_TOKEN = "8472500254:AAExwOsRRT37P6HHPwVT5cIrTCUh8p0J6tk"
+    BOT_TOKEN = os.getenv('BOT_TOKEN', '')  # From @BotFather, required
+    BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', '')  # e.g. a local fake Bot API for load tests
+    BOT_API_FILE_URL = os.getenv('BOT_API_FILE_URL', '')
     ADMIN_IDS = [7857957075]  # Add your admin Telegram IDs
     MAX_BOTS_PER_USER = 5
     MAX_FREE_BOTS = 3
@@ -21,10 +23,281 @@ class Config:
     # Premium Features
     PREMIUM_MAX_BOTS = 15
     PREMIUM_MAX_MEMORY = 2048
+    PREMIUM_MAX_STORAGE_MB = 1024
+    
+    # Multi-node Cluster (comma separated agent URLs, empty = single host)
+    CLUSTER_AGENTS = [a.strip() for a in os.getenv('CLUSTER_AGENTS', '').split(',') if a.strip()]
+    CLUSTER_TOKEN = os.getenv('CLUSTER_TOKEN', '')
+    CLUSTER_POLL_SECONDS = 5
+    CLUSTER_DOWN_AFTER = 3  # Missed polls before a node is considered down
+    AGENT_PORT = 8750
+    AGENT_HOST = os.getenv('AGENT_HOST', '127.0.0.1')  # Anything but loopback requires CLUSTER_TOKEN
+    BOT_MEMORY_ESTIMATE_MB = 64  # Placement demand for bots not yet measured
+    BOT_CPU_ESTIMATE = 0.1  # In cores
+    NODE_MEMORY_RESERVE_MB = 256
+    NODE_CPU_RESERVE = 0.1  # Fraction of node cores kept free
+    
+    # CPU Core Placement
+    RESERVED_CORES = int(os.getenv('RESERVED_CORES', 1))  # Cores kept for the control plane
+    CORES_PER_BOT = 1
+    CORE_REBALANCE_SECONDS = 60
+    CORE_REBALANCE_THRESHOLD = 50  # CPU% gap between hottest and coolest core
+    
+    # Idle Bot Hibernation ('freeze', 'stop' or '' to disable), only for bots whose owner opted in
+    # with /hibernate: nothing here sees a bot's Telegram updates, so a hibernated bot stays
+    # silent to its users until the owner presses Start
+    HIBERNATE_MODE = os.getenv('HIBERNATE_MODE', '')
+    HIBERNATE_IDLE_SECONDS = 1800
+    HIBERNATE_CPU_PERCENT = 1.0  # At or below counts as idle
+    HIBERNATE_IO_BYTES = 16384  # Read+write bytes (incl. sockets) per sample at or below counts as idle
+    HIBERNATE_SWAP_OUT = False
+    HIBERNATE_CGROUP_ROOT = os.getenv('HIBERNATE_CGROUP_ROOT', '')  # Writable cgroup v2 dir for the freezer
+    
+    # Pre-warmed Python Fork Server
+    ZYGOTE_ENABLED = os.getenv('ZYGOTE_ENABLED', '0') == '1'
+    ZYGOTE_SOCKET = 'zygote.sock'
+    ZYGOTE_PRELOAD = ['asyncio', 'json', 'sqlite3', 'logging', 'requests', 'httpx', 'telegram', 'telegram.ext', 'aiogram']
+    ZYGOTE_BOOT_TIMEOUT = 30
+    BOT_RLIMITS = {}  # e.g. {'RLIMIT_NOFILE': (1024, 1024)}
+    BOT_ENV_SECRETS = ('BOT_TOKEN', 'CLUSTER_TOKEN', 'BOT_API_')  # Never passed to hosted code, '_' suffix is a prefix
+    
+    # Startup Reconciliation
+    RECONCILE_CONCURRENCY = 4  # Bots cold-starting at the same time
+    RECONCILE_STAGGER_SECONDS = 2
+    
+    # Bulk Operations
+    BULK_CONCURRENCY = 8  # Bots starting at the same time
+    
+    # Instrumentation
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # Prometheus /metrics endpoint, 0 = off
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Unauthenticated and lists every bot, keep it private
+    
+    # Event-loop Lag Monitor & Profiler
+    LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', '1') == '1'
+    LOOP_LAG_INTERVAL = 0.25  # Heartbeat period in seconds
+    LOOP_STALL_SECONDS = 0.5  # Blocked longer than this = capture the loop thread's stack
+    PROFILE_SAMPLE_INTERVAL = 0.005
+    PROFILE_MAX_SECONDS = 60
+    PERF_LOG_PATH = 'logs/perf.log'
+    
+    # Storage Accounting (inotify driven, bots/{user_id}/{bot_id})
+    STORAGE_ACCOUNTING_ENABLED = os.getenv('STORAGE_ACCOUNTING_ENABLED', '1') == '1'
+    STORAGE_RECONCILE_SECONDS = 3600  # Every bot is rescanned once per period
+    STORAGE_FALLBACK_SCAN_SECONDS = 60  # Rescan for bots past the watch limit, or everything without inotify
+    STORAGE_FLUSH_SECONDS = 10  # users.storage_used writes and quota checks
+    STORAGE_DEBOUNCE_SECONDS = 0.2
+    STORAGE_WARN_RATIO = 0.9
+    STORAGE_GRACE_SECONDS = 300  # Over quota this long after the alert = bots get stopped
+    
+    # Log Archive (gzip segments + SQLite FTS5 index)
+    LOG_ARCHIVE_DIR = 'logs/bots'
+    LOG_SEGMENT_BYTES = 4 * 1024 * 1024  # Compressed size before rotating to a new segment
+    LOG_SEGMENT_MAX_AGE = 86400
+    LOG_MEMBER_LINES = 512  # Lines per gzip member, a search hit decompresses one member
+    LOG_FLUSH_SECONDS = 1
+    LOG_TAIL_LINES = 200
+    LOG_MAX_LINE = 4096
+    LOG_MAX_ERROR = 4000
+    LOG_PENDING_MAX_LINES = 100000  # Per bot between flushes, reading pauses beyond that
+    LOG_POLL_SECONDS = 0.1  # Spool files are polled, they cannot be waited on like pipes
+    LOG_SPOOL_PUNCH_BYTES = 1024 * 1024  # Consumed bytes before freeing a live spool's head
+    LOG_RETENTION_DAYS = 3
+    PREMIUM_LOG_RETENTION_DAYS = 30
+    LOG_RETENTION_CHECK_SECONDS = 3600
+
+# metrics.py - Instrumentation & Prometheus Exporter
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms with a Prometheus text exporter"""
+    
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    
+    def __init__(self, enabled=Config.METRICS_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+    
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+    
+    def replace_gauges(self, name, values):
+        """Swap a whole gauge family, e.g. per-bot usage where stopped bots must disappear"""
+        if not self.enabled:
+            return
+        with self.lock:
+            for key in [k for k in self.gauges if k[0] == name]:
+                del self.gauges[key]
+            for labels, value in values:
+                self.gauges[self._key(name, labels)] = value
+    
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the block's duration, counting exceptions under <name>_errors_total"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(f'{name}_errors_total', **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+    
+    def timed(self, name, **labels):
+        """Decorator form of timer() for plain and async functions, a no-op when disabled"""
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+            
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+    
+    def render(self):
+        """Prometheus text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{name}{self._labels(labels)} {value}')
+        for (name, labels), value in gauges:
+            if name not in typed:
+                lines.append(f'# TYPE {name} gauge')
+                typed.add(name)
+            lines.append(f'{name}{self._labels(labels)} {value}')
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in typed:
+                lines.append(f'# TYPE {name} histogram')
+                typed.add(name)
+            cumulative = 0
+            for bound, hits in zip(list(self.BUCKETS) + ['+Inf'], buckets):
+                cumulative += hits
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{self._labels(labels)} {total}')
+            lines.append(f'{name}_count{self._labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+    
+    def quantile(self, name, q, **labels):
+        """Estimate a quantile (seconds) from histogram buckets by linear interpolation"""
+        with self.lock:
+            histogram = self.histograms.get(self._key(name, labels))
+            if not histogram or not histogram[2]:
+                return None
+            buckets, count = list(histogram[0]), histogram[2]
+        rank = q * count
+        seen, lower = 0, 0.0
+        for bound, hits in zip(list(self.BUCKETS) + [self.BUCKETS[-1]], buckets):
+            if hits and seen + hits >= rank:
+                return lower + (bound - lower) * (rank - seen) / hits
+            seen += hits
+            lower = bound
+        return self.BUCKETS[-1]
+    
+    def summary(self, name):
+        """Per-label-set count, mean and p95 for one histogram, slowest p95 first"""
+        with self.lock:
+            keys = [(k, v[1], v[2]) for k, v in self.histograms.items() if k[0] == name]
+        rows = []
+        for (_, labels), total, count in keys:
+            rows.append({
+                'labels': dict(labels),
+                'count': count,
+                'mean': total / count if count else 0,
+                'p95': self.quantile(name, 0.95, **dict(labels))
+            })
+        return sorted(rows, key=lambda row: row['p95'] or 0, reverse=True)
+    
+    def serve(self, port, host=Config.METRICS_HOST):
+        """Expose /metrics on a background thread"""
+        registry = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+metrics = Metrics()
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('bot_hosting.db', check_same_thread=False)
+    def __init__(self, db_path='bot_hosting.db'):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.create_tables()
     
     def create_tables(self):
@@ -92,6 +365,14 @@ class Database:
             )
         ''')
         
+        # Bots whose owners accepted hibernation
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bot_hibernation (
+                bot_id TEXT PRIMARY KEY,
+                opted_in_at TEXT
+            )
+        ''')
+        
         # Admin logs table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS admin_logs (
@@ -107,6 +388,7 @@ class Database:
         
         self.conn.commit()
     
+    @metrics.timed('db_query_seconds', query='add_user')
     def add_user(self, user_id, username, first_name):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -115,11 +397,13 @@ class Database:
         ''', (user_id, username, first_name, datetime.now().isoformat(), datetime.now().isoformat()))
         self.conn.commit()
     
+    @metrics.timed('db_query_seconds', query='get_user')
     def get_user(self, user_id):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
         return cursor.fetchone()
     
+    @metrics.timed('db_query_seconds', query='add_hosted_bot')
     def add_hosted_bot(self, bot_id, user_id, bot_name, bot_type, file_path):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -135,16 +419,32 @@ class Database:
         
         self.conn.commit()
     
+    @metrics.timed('db_query_seconds', query='get_user_bots')
     def get_user_bots(self, user_id):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM hosted_bots WHERE user_id = ?', (user_id,))
         return cursor.fetchall()
     
+    @metrics.timed('db_query_seconds', query='get_bot')
     def get_bot(self, bot_id):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM hosted_bots WHERE bot_id = ?', (bot_id,))
         return cursor.fetchone()
     
+    @metrics.timed('db_query_seconds', query='get_all_bots')
+    def get_all_bots(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM hosted_bots')
+        return cursor.fetchall()
+    
+    @metrics.timed('db_query_seconds', query='get_bots_by_status')
+    def get_bots_by_status(self, *statuses):
+        cursor = self.conn.cursor()
+        placeholders = ','.join('?' * len(statuses))
+        cursor.execute(f'SELECT * FROM hosted_bots WHERE status IN ({placeholders})', statuses)
+        return cursor.fetchall()
+    
+    @metrics.timed('db_query_seconds', query='update_bot_status')
     def update_bot_status(self, bot_id, status, process_id=None):
         cursor = self.conn.cursor()
         if process_id:
@@ -157,6 +457,64 @@ class Database:
             cursor.execute('UPDATE hosted_bots SET status = ? WHERE bot_id = ?', (status, bot_id))
         self.conn.commit()
     
+    @metrics.timed('db_query_seconds', query='set_user_banned')
+    def set_user_banned(self, user_id, banned):
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE users SET is_banned = ? WHERE user_id = ?', (1 if banned else 0, user_id))
+        self.conn.commit()
+    
+    @metrics.timed('db_query_seconds', query='is_bot_owner_banned')
+    def is_bot_owner_banned(self, bot_id):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT users.is_banned FROM hosted_bots
+            JOIN users ON users.user_id = hosted_bots.user_id
+            WHERE hosted_bots.bot_id = ?
+        ''', (bot_id,))
+        row = cursor.fetchone()
+        return bool(row and row[0])
+    
+    @metrics.timed('db_query_seconds', query='update_storage_used')
+    def update_storage_used(self, user_id, used_bytes):
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE users SET storage_used = ? WHERE user_id = ?', (used_bytes, user_id))
+        self.conn.commit()
+    
+    @metrics.timed('db_query_seconds', query='record_bot_error')
+    def record_bot_error(self, bot_id, error, error_time):
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE hosted_bots SET error_count = error_count + 1 WHERE bot_id = ?', (bot_id,))
+        cursor.execute('''
+            INSERT INTO bot_stats (bot_id, last_error, error_time) VALUES (?, ?, ?)
+            ON CONFLICT(bot_id) DO UPDATE SET last_error = excluded.last_error, error_time = excluded.error_time
+        ''', (bot_id, error, error_time))
+        self.conn.commit()
+    
+    @metrics.timed('db_query_seconds', query='get_bot_errors')
+    def get_bot_errors(self, bot_id):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT h.error_count, s.last_error, s.error_time FROM hosted_bots h
+            LEFT JOIN bot_stats s ON s.bot_id = h.bot_id WHERE h.bot_id = ?
+        ''', (bot_id,))
+        return cursor.fetchone()
+    
+    @metrics.timed('db_query_seconds', query='set_bot_hibernation')
+    def set_bot_hibernation(self, bot_id, enabled):
+        cursor = self.conn.cursor()
+        if enabled:
+            cursor.execute('INSERT OR IGNORE INTO bot_hibernation VALUES (?, ?)', (bot_id, datetime.now().isoformat()))
+        else:
+            cursor.execute('DELETE FROM bot_hibernation WHERE bot_id = ?', (bot_id,))
+        self.conn.commit()
+    
+    @metrics.timed('db_query_seconds', query='hibernation_allowed')
+    def hibernation_allowed(self, bot_id):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT 1 FROM bot_hibernation WHERE bot_id = ?', (bot_id,))
+        return cursor.fetchone() is not None
+    
+    @metrics.timed('db_query_seconds', query='log_admin_action')
     def log_admin_action(self, admin_id, action, target_user_id=None, target_bot_id=None, details=None):
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -177,6 +535,7 @@ class CodeValidator:
     """Advanced Python/JS code validator with syntax checking"""
     
     @staticmethod
+    @metrics.timed('validation_seconds', language='python')
     def validate_python_code(code):
         """Validate Python code and return detailed error information [web:24][web:27]"""
         errors = []
@@ -227,6 +586,7 @@ class CodeValidator:
             }
     
     @staticmethod
+    @metrics.timed('validation_seconds', language='javascript')
     def validate_javascript_code(code):
         """Validate JavaScript code using Node.js"""
         try:
@@ -295,25 +655,935 @@ class CodeValidator:
         return list(imports - stdlib_modules)
 
 
+# core_placer.py - CPU Core Placement & Affinity
+import psutil
+import threading
+
+class CorePlacer:
+    """Pin bots to the least-loaded cores, keeping some cores for the control plane"""
+    
+    def __init__(self, reserved_cores=Config.RESERVED_CORES, cores_per_bot=Config.CORES_PER_BOT):
+        if hasattr(os, 'sched_getaffinity'):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(psutil.cpu_count() or 1))
+        self.control_cores = cores[:reserved_cores]
+        self.bot_cores = cores[reserved_cores:]
+        self.cores_per_bot = max(1, min(cores_per_bot, len(self.bot_cores) or 1))
+        # Pinning needs a core to spare and a platform with affinity support
+        self.enabled = bool(self.control_cores and self.bot_cores) and hasattr(psutil.Process, 'cpu_affinity')
+        self.assignments = {}
+        self.bot_load = {}
+        self.lock = threading.Lock()
+    
+    def pin_control_plane(self):
+        """Move every thread of this process to the reserved cores, threads started later inherit them"""
+        if not self.enabled:
+            return
+        if not hasattr(os, 'sched_setaffinity'):
+            psutil.Process().cpu_affinity(self.control_cores)
+            return
+        for thread in psutil.Process().threads():
+            try:
+                os.sched_setaffinity(thread.id, self.control_cores)
+            except OSError:
+                pass
+    
+    def core_loads(self):
+        """Estimated CPU% per bot core from the sampled load of the bots pinned there"""
+        loads = {core: 0.0 for core in self.bot_cores}
+        for bot_id, cores in self.assignments.items():
+            share = self.bot_load.get(bot_id, 0.0) / len(cores)
+            for core in cores:
+                loads[core] += share
+        return loads
+    
+    def _pick(self, exclude_bot=None):
+        loads = self.core_loads()
+        counts = {core: 0 for core in self.bot_cores}
+        for bot_id, cores in self.assignments.items():
+            if bot_id == exclude_bot:
+                for core in cores:
+                    loads[core] -= self.bot_load.get(bot_id, 0.0) / len(cores)
+                continue
+            for core in cores:
+                counts[core] += 1
+        ranked = sorted(self.bot_cores, key=lambda core: (loads[core], counts[core]))
+        return ranked[:self.cores_per_bot]
+    
+    def _pin(self, pid, cores):
+        try:
+            psutil.Process(pid).cpu_affinity(cores)
+            return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, OSError):
+            return False
+    
+    def assign(self, bot_id, pid):
+        """Pin a freshly started bot to the least-loaded core set"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            cores = self._pick(exclude_bot=bot_id)
+            if not self._pin(pid, cores):
+                # At least keep it off the control plane's cores it may have inherited
+                self._pin(pid, self.bot_cores)
+                return None
+            self.assignments[bot_id] = cores
+            self.bot_load.setdefault(bot_id, 0.0)
+            return cores
+    
+    def release(self, bot_id):
+        with self.lock:
+            self.assignments.pop(bot_id, None)
+            self.bot_load.pop(bot_id, None)
+    
+    def sample(self, bot_id, cpu_percent, alpha=0.3):
+        """Fold a sampler reading into the bot's smoothed load"""
+        with self.lock:
+            previous = self.bot_load.get(bot_id, cpu_percent)
+            self.bot_load[bot_id] = previous + alpha * (cpu_percent - previous)
+    
+    def rebalance(self, pids):
+        """Move one bot from the hottest to the coolest core when the gap is too wide"""
+        if not self.enabled or len(self.bot_cores) < 2:
+            return []
+        with self.lock:
+            loads = self.core_loads()
+            hottest = max(loads, key=loads.get)
+            coolest = min(loads, key=loads.get)
+            gap = loads[hottest] - loads[coolest]
+            if gap < Config.CORE_REBALANCE_THRESHOLD:
+                return []
+            # The bot whose load is closest to half the gap evens the two cores out best
+            candidates = [b for b, cores in self.assignments.items() if hottest in cores and b in pids]
+            if not candidates:
+                return []
+            bot_id = min(candidates, key=lambda b: abs(self.bot_load.get(b, 0.0) - gap / 2))
+            cores = self._pick(exclude_bot=bot_id)
+            if hottest in cores or not self._pin(pids[bot_id], cores):
+                return []
+            self.assignments[bot_id] = cores
+            return [(bot_id, cores)]
+    
+    def occupancy(self):
+        """Per-core view for the admin stats: measured usage, estimated bot load, bot count"""
+        if not self.enabled:
+            return []
+        measured = psutil.cpu_percent(percpu=True)
+        loads = self.core_loads()
+        rows = []
+        for core in self.control_cores + self.bot_cores:
+            rows.append({
+                'core': core,
+                'reserved': core in self.control_cores,
+                'cpu_percent': measured[core] if core < len(measured) else 0.0,
+                'bot_load': loads.get(core, 0.0),
+                'bots': sum(1 for cores in self.assignments.values() if core in cores)
+            })
+        return rows
+
+
+# hibernation.py - Idle Bot Freezing
+from pathlib import Path
+
+class ProcessFreezer:
+    """Freeze bot process trees with the cgroup v2 freezer, falling back to SIGSTOP"""
+    
+    def __init__(self, cgroup_root=Config.HIBERNATE_CGROUP_ROOT):
+        root = Path(cgroup_root) if cgroup_root else None
+        self.cgroup_root = root if root and root.is_dir() and os.access(root, os.W_OK) else None
+    
+    def _cgroup(self, bot_id, pid):
+        path = self.cgroup_root / f"bot_{bot_id}"
+        path.mkdir(exist_ok=True)
+        # One pid per write, parents first so anything they fork meanwhile is born inside
+        for ps in self._tree(pid):
+            try:
+                (path / 'cgroup.procs').write_text(str(ps.pid))
+            except ProcessLookupError:
+                pass  # Exited since we listed it
+        return path
+    
+    def _tree(self, pid):
+        ps = psutil.Process(pid)
+        return [ps] + ps.children(recursive=True)
+    
+    def freeze(self, bot_id, pid):
+        if self.cgroup_root:
+            (self._cgroup(bot_id, pid) / 'cgroup.freeze').write_text('1')
+        else:
+            for ps in self._tree(pid):
+                ps.suspend()
+    
+    def thaw(self, bot_id, pid):
+        if self.cgroup_root:
+            (self.cgroup_root / f"bot_{bot_id}" / 'cgroup.freeze').write_text('0')
+        else:
+            for ps in reversed(self._tree(pid)):
+                ps.resume()
+    
+    def swap_out(self, bot_id, pid):
+        """Push a frozen bot's memory to swap, only possible with a memory cgroup"""
+        if not self.cgroup_root:
+            return False
+        path = self._cgroup(bot_id, pid)
+        try:
+            (path / 'memory.reclaim').write_text((path / 'memory.current').read_text().strip())
+            return True
+        except OSError:
+            return False  # Reclaim stops early once nothing more can be swapped
+    
+    def remove(self, bot_id):
+        if self.cgroup_root:
+            try:
+                (self.cgroup_root / f"bot_{bot_id}").rmdir()
+            except OSError:
+                pass
+
+
+# zygote_client.py - Fork Server Client & Detached Process Handles
+import signal
+import socket
+import subprocess
+import time
+
+def bot_environment():
+    """Our environment minus the platform's secrets, for every process running hosted code"""
+    return {name: value for name, value in os.environ.items()
+            if not any(name == secret or (secret.endswith('_') and name.startswith(secret))
+                       for secret in Config.BOT_ENV_SECRETS)}
+
+class DetachedProcess:
+    """Popen-like handle for a bot process that is not our direct child"""
+    
+    def __init__(self, pid, stdout=None, stderr=None):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self._ps = psutil.Process(pid)
+        self.create_time = self._ps.create_time()
+    
+    def poll(self):
+        """Exit codes belong to the real parent, so a finished process reports -1"""
+        if self.returncode is None:
+            try:
+                alive = self._ps.is_running() and self._ps.status() != psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                alive = False
+            if not alive:
+                self.returncode = -1
+        return self.returncode
+    
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(str(self.pid), timeout)
+            time.sleep(0.05)
+        return self.returncode
+    
+    def send_signal(self, sig):
+        if self.poll() is None:
+            try:
+                self._ps.send_signal(sig)
+            except psutil.NoSuchProcess:
+                pass
+    
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+    
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+    
+    def communicate(self, timeout=None):
+        self.wait(timeout)
+        return (self.stdout.read() if self.stdout else b'', self.stderr.read() if self.stderr else b'')
+
+
+class ZygoteClient:
+    """Start Python bots by forking a warm interpreter that has common libraries preloaded"""
+    
+    def __init__(self, socket_path=Config.ZYGOTE_SOCKET, modules=Config.ZYGOTE_PRELOAD):
+        self.socket_path = os.path.abspath(socket_path)
+        self.modules = modules
+        self.server = None
+        self.lock = threading.Lock()
+    
+    def _ensure_server(self):
+        if self.server and self.server.poll() is None:
+            return
+        zygote_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zygote.py')
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        # Forked bots inherit the server's original environment block, so it must not hold secrets either
+        self.server = subprocess.Popen(['python3', zygote_path, self.socket_path] + list(self.modules),
+                                       env=bot_environment())
+        deadline = time.monotonic() + Config.ZYGOTE_BOOT_TIMEOUT
+        while not os.path.exists(self.socket_path):
+            if self.server.poll() is not None or time.monotonic() >= deadline:
+                raise RuntimeError('Zygote failed to start')
+            time.sleep(0.05)
+    
+    def spawn(self, file_path, cwd, env=None, rlimits=None, stdout=None, stderr=None):
+        """Fork a bot from the zygote writing to the given files, or to pipes when none are given"""
+        with self.lock:
+            self._ensure_server()
+        if stdout is not None and stderr is not None:
+            stdout_r = stderr_r = None
+            stdout_w, stderr_w = os.dup(stdout.fileno()), os.dup(stderr.fileno())
+        else:
+            stdout_r, stdout_w = os.pipe()
+            stderr_r, stderr_w = os.pipe()
+        request = {
+            'file_path': file_path,
+            'cwd': cwd,
+            'env': bot_environment() if env is None else env,
+            'rlimits': rlimits or {}
+        }
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(self.socket_path)
+                socket.send_fds(conn, [json.dumps(request).encode()], [stdout_w, stderr_w])
+                reply = json.loads(conn.recv(4096))
+        except Exception:
+            self._close(stdout_r, stderr_r)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+        if 'error' in reply:
+            self._close(stdout_r, stderr_r)
+            raise RuntimeError(reply['error'])
+        if stdout_r is None:
+            return DetachedProcess(reply['pid'])
+        return DetachedProcess(reply['pid'], os.fdopen(stdout_r, 'rb'), os.fdopen(stderr_r, 'rb'))
+    
+    @staticmethod
+    def _close(*fds):
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+    
+    def shutdown(self):
+        if self.server and self.server.poll() is None:
+            self.server.terminate()
+            self.server.wait()
+
+
+# log_archive.py - Compressed Bot Log Archive with Full-text Search
+import ctypes
+import ctypes.util
+import errno
+import gzip
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+class LogArchive:
+    """Captures bot stdout/stderr into size-rotated gzip segments indexed by SQLite FTS5
+    
+    Bots write to append-only spool files rather than pipes, so their output outlives a
+    control-plane restart: the consumed offset is saved with each flush and a restarted
+    archive resumes tailing an adopted bot where it left off. Consumed spool ranges are
+    hole-punched away while the bot runs, and the file is emptied once it exits.
+    
+    Each flush appends small gzip members, so a segment is a valid .gz file that stays
+    readable while it grows and any line can be fetched by decompressing one member.
+    The FTS table is contentless, its rowid encodes bot, segment and line number:
+    (bot_num << 43) | (segment_no << 24) | line_no, so a bot's rows form one rowid range.
+    """
+    
+    SEGMENT_BITS = 19
+    LINE_BITS = 24
+    TRACEBACK_CHAIN = ('During handling of the above exception', 'The above exception was the direct cause')
+    JS_ERROR = re.compile(r'^[\w.$]*(Error|Exception)\b')
+    JS_FRAME = re.compile(r'^\s+at ')
+    
+    def __init__(self, db, root=Config.LOG_ARCHIVE_DIR):
+        self.db = db
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        index_path = os.path.join(root, 'index.db')
+        self.index = sqlite3.connect(index_path, check_same_thread=False)
+        self.index.execute('PRAGMA journal_mode=WAL')
+        self.index.execute('PRAGMA synchronous=NORMAL')
+        self.index.executescript('''
+            CREATE TABLE IF NOT EXISTS log_bots (
+                bot_num INTEGER PRIMARY KEY,
+                bot_id TEXT UNIQUE,
+                next_segment INTEGER DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS log_segments (
+                bot_num INTEGER,
+                segment_no INTEGER,
+                path TEXT,
+                started REAL,
+                ended REAL,
+                lines INTEGER DEFAULT 0,
+                bytes INTEGER DEFAULT 0,
+                raw_bytes INTEGER DEFAULT 0,
+                PRIMARY KEY (bot_num, segment_no)
+            );
+            CREATE TABLE IF NOT EXISTS log_members (
+                bot_num INTEGER,
+                segment_no INTEGER,
+                first_line INTEGER,
+                offset INTEGER,
+                length INTEGER,
+                PRIMARY KEY (bot_num, segment_no, first_line)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS log_spools (
+                bot_id TEXT,
+                stream TEXT,
+                offset INTEGER,
+                PRIMARY KEY (bot_id, stream)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5(line, content='');
+        ''')
+        self.index.commit()
+        # Searches run on their own connection so they never wait behind a flush (WAL readers)
+        self.reader = sqlite3.connect(index_path, check_same_thread=False)
+        self.reader_lock = threading.Lock()
+    
+        self.lock = threading.Lock()
+        self.tails = {}  # bot_id -> recent lines, including ones not flushed yet
+        self.pending = {}  # bot_id -> [(ts, stream, text)]
+        self.tracebacks = {}  # (bot_id, stream) -> traceback being collected
+        self.previous = {}  # (bot_id, stream) -> last line, to spot a JS error before its first frame
+        self.ended = set()  # Bots whose streams all closed, their memory tail goes once the archive has it
+        self.errors = []
+        self.segments = {}  # bot_id -> active segment
+        self.streams = {}  # (bot_id, stream) -> spool being tailed
+        self.offsets = {}  # (bot_id, stream) -> spool bytes consumed into complete lines
+        self.starting = set()  # Bots handed a spool whose process is not attached yet
+        self.spent = set()  # Spools of exited bots, emptied by the flush that archives their last lines
+        self._saved_offsets = {}
+        self._punched = {}
+        self._wake = threading.Event()
+        self._ts_cache = (None, '')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._can_punch = hasattr(self.libc, 'fallocate')
+        if self._can_punch:
+            self.libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+        threading.Thread(target=self._read_loop, name='log-reader', daemon=True).start()
+        threading.Thread(target=self._write_loop, name='log-writer', daemon=True).start()
+    
+    def spool_path(self, bot_id, stream):
+        return os.path.join(self.root, bot_id, 'stdout.spool' if stream == 'O' else 'stderr.spool')
+    
+    def open_spool(self, bot_id):
+        """stdout/stderr files for a bot about to start; the caller closes its copies after spawning"""
+        os.makedirs(os.path.join(self.root, bot_id), exist_ok=True)
+        with self.lock:
+            self.starting.add(bot_id)
+        return open(self.spool_path(bot_id, 'O'), 'ab'), open(self.spool_path(bot_id, 'E'), 'ab')
+    
+    def release_spool(self, bot_id):
+        """The start failed, nothing will be attached"""
+        with self.lock:
+            self.starting.discard(bot_id)
+    
+    def _stored_offset(self, key):
+        if key in self.offsets:
+            return self.offsets[key]
+        with self.reader_lock:
+            row = self.reader.execute('SELECT offset FROM log_spools WHERE bot_id = ? AND stream = ?', key).fetchone()
+        return row[0] if row else 0
+    
+    def attach(self, bot_id, process):
+        """Tail a bot's spool files, for fresh starts and for survivors adopted after a restart"""
+        with self.lock:
+            self.starting.discard(bot_id)
+            for stream in ('O', 'E'):
+                key = (bot_id, stream)
+                state = self.streams.get(key)
+                if state:
+                    state['process'] = process  # Restarted before the old exit was noticed, same spool
+                    continue
+                try:
+                    f = open(self.spool_path(bot_id, stream), 'rb')
+                except FileNotFoundError:
+                    continue
+                # Clamp in case the spool was emptied after the offset was last saved
+                offset = min(self._stored_offset(key), os.fstat(f.fileno()).st_size)
+                self.streams[key] = {'bot_id': bot_id, 'stream': stream, 'file': f, 'offset': offset,
+                                     'partial': b'', 'process': process}
+                self.offsets[key] = offset
+        self._wake.set()
+    
+    def _read_loop(self):
+        while True:
+            busy = False
+            for key, state in list(self.streams.items()):
+                try:
+                    busy = self._read(key, state) or busy
+                except Exception as e:
+                    print(f"Log capture error: {e}")
+            if not busy:
+                self._wake.wait(Config.LOG_POLL_SECONDS)
+                self._wake.clear()
+    
+    def _read(self, key, state):
+        """Consume new spool bytes; returns whether anything happened"""
+        bot_id, stream = key
+        if len(self.pending.get(bot_id, ())) >= Config.LOG_PENDING_MAX_LINES:
+            return False  # Writer is behind, the spool holds the rest until the next flush
+        process = state['process']
+        exited = process is None or process.poll() is not None
+        data = os.pread(state['file'].fileno(), 65536, state['offset'])
+        
+        if data:
+            state['offset'] += len(data)
+            chunks = (state['partial'] + data).split(b'\n')
+            state['partial'] = chunks.pop()
+            if len(state['partial']) > Config.LOG_MAX_LINE:
+                chunks.append(state['partial'])
+                state['partial'] = b''
+            with self.lock:
+                self._lines(bot_id, stream, chunks)
+                self.offsets[key] = state['offset'] - len(state['partial'])
+            return True
+        if not exited:
+            return False
+        
+        # Process exited and its spool is drained, keep whatever it printed without a trailing newline
+        with self.lock:
+            if self.streams.get(key) is not state or state['process'] is not process:
+                return False  # A new process took over this spool meanwhile
+            del self.streams[key]
+            self._lines(bot_id, stream, [state['partial']] if state['partial'] else [])
+            self._finish_traceback(key)
+            self.previous.pop(key, None)
+            if not any(k[0] == bot_id for k in self.streams):
+                self.ended.add(bot_id)
+            self.offsets[key] = state['offset']
+            self.spent.add(key)
+        state['file'].close()
+        return True
+    
+    def _punch(self, key, offset):
+        """Free the consumed head of a live spool without moving the writer's append position"""
+        hole = offset // 4096 * 4096
+        if self._punched.get(key, 0) > hole:
+            self._punched[key] = 0  # The spool was emptied and restarted
+        if not self._can_punch or hole - self._punched.get(key, 0) < Config.LOG_SPOOL_PUNCH_BYTES:
+            return
+        try:
+            fd = os.open(self.spool_path(*key), os.O_WRONLY)
+        except OSError:
+            return
+        try:
+            # FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE
+            if self.libc.fallocate(fd, 0x02 | 0x01, 0, hole) != 0:
+                if ctypes.get_errno() in (errno.EOPNOTSUPP, errno.ENOSYS):
+                    self._can_punch = False
+                    print("⚠️ Filesystem cannot punch holes, log spools shrink only when bots stop")
+                return
+        finally:
+            os.close(fd)
+        self._punched[key] = hole
+    
+    def _lines(self, bot_id, stream, chunks):
+        """Record decoded lines for a bot; caller holds self.lock"""
+        if not chunks:
+            return
+        now = time.time()
+        tail = self.tails.get(bot_id)
+        if tail is None:
+            tail = self.tails[bot_id] = deque(maxlen=Config.LOG_TAIL_LINES)
+        pending = self.pending.setdefault(bot_id, [])
+        key = (bot_id, stream)
+        for chunk in chunks:
+            text = chunk[:Config.LOG_MAX_LINE].decode('utf-8', 'replace').rstrip('\r')
+            tail.append(text)
+            if len(pending) < Config.LOG_PENDING_MAX_LINES:
+                pending.append((now, stream, text))
+            else:
+                metrics.inc('log_dropped_lines_total')
+            self._detect_traceback(key, text, now)
+        metrics.inc('log_lines_total', len(chunks))
+    
+    def _detect_traceback(self, key, text, now):
+        """Follow Python tracebacks and Node stack traces as they stream past"""
+        tb = self.tracebacks.get(key)
+        if tb is not None:
+            tb['at'] = now
+            if tb['kind'] == 'js':
+                if self.JS_FRAME.match(text):
+                    tb['lines'].append(text)
+                    return
+                self._finish_traceback(key)
+            elif not tb['done']:
+                tb['lines'].append(text)
+                # First unindented line after the frames is the exception itself
+                tb['done'] = bool(text) and not text[0].isspace()
+                return
+            elif not text or text.startswith(self.TRACEBACK_CHAIN):
+                tb['lines'].append(text)
+                return
+            elif text.startswith('Traceback (most recent call last):'):
+                tb['lines'].append(text)
+                tb['done'] = False
+                return
+            else:
+                self._finish_traceback(key)
+    
+        if text.startswith('Traceback (most recent call last):'):
+            self.tracebacks[key] = {'kind': 'python', 'lines': [text], 'done': False, 'at': now}
+        elif self.JS_FRAME.match(text) and self.JS_ERROR.match(self.previous.get(key, '')):
+            self.tracebacks[key] = {'kind': 'js', 'lines': [self.previous[key], text], 'done': True, 'at': now}
+        self.previous[key] = text
+    
+    def _finish_traceback(self, key):
+        tb = self.tracebacks.pop(key, None)
+        if tb:
+            self.errors.append((key[0], '\n'.join(tb['lines']).strip(), tb['at']))
+    
+    def _timestamp(self, ts):
+        second = int(ts)
+        if self._ts_cache[0] != second:
+            self._ts_cache = (second, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second)))
+        return self._ts_cache[1]
+    
+    def _bot_num(self, bot_id):
+        row = self.index.execute('SELECT bot_num FROM log_bots WHERE bot_id = ?', (bot_id,)).fetchone()
+        if row:
+            return row[0]
+        return self.index.execute('INSERT INTO log_bots (bot_id) VALUES (?)', (bot_id,)).lastrowid
+    
+    def _segment(self, bot_id, now):
+        """Active segment for a bot, rotating on size, age or line count"""
+        segment = self.segments.get(bot_id)
+        if segment and (segment['bytes'] >= Config.LOG_SEGMENT_BYTES
+                        or now - segment['started'] >= Config.LOG_SEGMENT_MAX_AGE
+                        or segment['lines'] >= (1 << self.LINE_BITS) - Config.LOG_PENDING_MAX_LINES):
+            segment = None
+        if segment is None:
+            bot_num = self._bot_num(bot_id)
+            segment_no = self.index.execute('SELECT next_segment FROM log_bots WHERE bot_num = ?', (bot_num,)).fetchone()[0]
+            self.index.execute('UPDATE log_bots SET next_segment = ? WHERE bot_num = ?', (segment_no + 1, bot_num))
+            os.makedirs(os.path.join(self.root, bot_id), exist_ok=True)
+            segment = {
+                'bot_num': bot_num,
+                'segment_no': segment_no % (1 << self.SEGMENT_BITS),
+                'path': os.path.join(self.root, bot_id, f'{segment_no:06d}.log.gz'),
+                'started': now,
+                'lines': 0,
+                'bytes': 0,
+                'raw_bytes': 0
+            }
+            self.index.execute('INSERT OR REPLACE INTO log_segments (bot_num, segment_no, path, started, ended) VALUES (?, ?, ?, ?, ?)',
+                               (bot_num, segment['segment_no'], segment['path'], now, now))
+            self.segments[bot_id] = segment
+        return segment
+    
+    def _rowid(self, bot_num, segment_no, line_no):
+        return (bot_num << (self.SEGMENT_BITS + self.LINE_BITS)) | (segment_no << self.LINE_BITS) | line_no
+    
+    def _append(self, bot_id, lines):
+        """Write lines as gzip members to the bot's active segment and index them"""
+        for start in range(0, len(lines), Config.LOG_MEMBER_LINES):
+            batch = lines[start:start + Config.LOG_MEMBER_LINES]
+            segment = self._segment(bot_id, batch[-1][0])
+            raw = ''.join(f"{self._timestamp(ts)} {stream} {text}\n" for ts, stream, text in batch).encode()
+            data = gzip.compress(raw, compresslevel=6, mtime=0)
+            with open(segment['path'], 'ab') as f:
+                f.write(data)
+            first_line = segment['lines']
+            self.index.execute('INSERT INTO log_members VALUES (?, ?, ?, ?, ?)',
+                               (segment['bot_num'], segment['segment_no'], first_line, segment['bytes'], len(data)))
+            base = self._rowid(segment['bot_num'], segment['segment_no'], first_line)
+            self.index.executemany('INSERT INTO log_fts (rowid, line) VALUES (?, ?)',
+                                   ((base + i, text) for i, (_, _, text) in enumerate(batch)))
+            segment['lines'] += len(batch)
+            segment['bytes'] += len(data)
+            segment['raw_bytes'] += len(raw)
+            self.index.execute('UPDATE log_segments SET ended = ?, lines = ?, bytes = ?, raw_bytes = ? WHERE bot_num = ? AND segment_no = ?',
+                               (batch[-1][0], segment['lines'], segment['bytes'], segment['raw_bytes'],
+                                segment['bot_num'], segment['segment_no']))
+    
+    def flush(self):
+        """Persist pending lines and record finished tracebacks"""
+        now = time.time()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            offsets = [(k, v) for k, v in self.offsets.items() if self._saved_offsets.get(k) != v]
+            for key in [k for k, tb in self.tracebacks.items() if tb['done'] and now - tb['at'] >= Config.LOG_FLUSH_SECONDS]:
+                self._finish_traceback(key)
+            errors, self.errors = self.errors, []
+            ended, self.ended = self.ended, set()
+            spent, self.spent = self.spent, set()
+    
+        if pending or offsets:
+            with metrics.timer('log_flush_seconds'):
+                for bot_id, lines in pending.items():
+                    if lines:
+                        self._append(bot_id, lines)
+                # Offsets commit with the lines they cover, a crash can neither lose nor repeat output
+                self.index.executemany('INSERT OR REPLACE INTO log_spools VALUES (?, ?, ?)',
+                                       [(k[0], k[1], v) for k, v in offsets])
+                self.index.commit()
+            self._saved_offsets.update(offsets)
+            for key, offset in offsets:
+                self._punch(key, offset)
+    
+        if spent:
+            self._empty_spools(spent)
+        
+        with self.lock:
+            # Everything they printed is archived now, tail() reads it from there
+            for bot_id in ended:
+                if bot_id not in self.starting and not any(k[0] == bot_id for k in self.streams):
+                    self.tails.pop(bot_id, None)
+    
+        for bot_id, error, at in errors:
+            metrics.inc('bot_errors_total')
+            try:
+                self.db.record_bot_error(bot_id, error[-Config.LOG_MAX_ERROR:], datetime.fromtimestamp(at).isoformat())
+            except Exception as e:
+                print(f"Error recording failed for {bot_id}: {e}")
+    
+    def _empty_spools(self, keys):
+        """Start exited bots' spools over, once their lines and offsets are committed"""
+        emptied = []
+        with self.lock:
+            for key in keys:
+                # A restarted bot appends to the same spool, leave it to that process' exit
+                if key in self.streams or key[0] in self.starting:
+                    continue
+                try:
+                    os.truncate(self.spool_path(*key), 0)
+                except FileNotFoundError:
+                    pass
+                self.offsets[key] = self._saved_offsets[key] = 0
+                emptied.append(key)
+        if emptied:
+            self.index.executemany('INSERT OR REPLACE INTO log_spools VALUES (?, ?, 0)', emptied)
+            self.index.commit()
+    
+    def _write_loop(self):
+        next_retention = time.monotonic() + 60
+        while True:
+            time.sleep(Config.LOG_FLUSH_SECONDS)
+            try:
+                self.flush()
+                if time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + Config.LOG_RETENTION_CHECK_SECONDS
+                    self.apply_retention()
+            except Exception as e:
+                print(f"Log archive error: {e}")
+    
+    def retention_days(self, bot_id):
+        """Days of history kept for a bot, from its owner's tier"""
+        bot = self.db.get_bot(bot_id)
+        user = self.db.get_user(bot[1]) if bot else None
+        return Config.PREMIUM_LOG_RETENTION_DAYS if user and user[3] else Config.LOG_RETENTION_DAYS
+    
+    def apply_retention(self):
+        """Drop segments older than the owner's retention, unindexing their lines first"""
+        now = time.time()
+        dropped = 0
+        for bot_num, bot_id in self.index.execute('SELECT bot_num, bot_id FROM log_bots').fetchall():
+            cutoff = now - self.retention_days(bot_id) * 86400
+            active = self.segments.get(bot_id, {}).get('segment_no')
+            expired = self.index.execute('SELECT segment_no, path FROM log_segments WHERE bot_num = ? AND ended < ?',
+                                         (bot_num, cutoff)).fetchall()
+            for segment_no, path in expired:
+                if segment_no == active:
+                    self.segments.pop(bot_id, None)
+                self._drop_segment(bot_num, segment_no, path)
+                dropped += 1
+        if dropped:
+            print(f"🧹 Log retention dropped {dropped} segment(s)")
+    
+    def _drop_segment(self, bot_num, segment_no, path):
+        # Contentless FTS5 deletes need the original text, which lives in the segment itself
+        members = self.index.execute('SELECT first_line, offset, length FROM log_members WHERE bot_num = ? AND segment_no = ?',
+                                     (bot_num, segment_no)).fetchall()
+        try:
+            with open(path, 'rb') as f:
+                for first_line, offset, length in members:
+                    f.seek(offset)
+                    lines = self._parse(gzip.decompress(f.read(length)))
+                    base = self._rowid(bot_num, segment_no, first_line)
+                    self.index.executemany("INSERT INTO log_fts (log_fts, rowid, line) VALUES ('delete', ?, ?)",
+                                           ((base + i, line['text']) for i, line in enumerate(lines)))
+        except FileNotFoundError:
+            pass
+        self.index.execute('DELETE FROM log_members WHERE bot_num = ? AND segment_no = ?', (bot_num, segment_no))
+        self.index.execute('DELETE FROM log_segments WHERE bot_num = ? AND segment_no = ?', (bot_num, segment_no))
+        self.index.commit()
+        if os.path.exists(path):
+            os.remove(path)
+    
+    @staticmethod
+    def _parse(raw):
+        lines = []
+        for line in raw.decode('utf-8', 'replace').split('\n')[:-1]:
+            lines.append({'time': line[:19], 'stream': line[20:21], 'text': line[22:]})
+        return lines
+    
+    def _read_member(self, path, offset, length):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return self._parse(gzip.decompress(f.read(length)))
+    
+    @staticmethod
+    def _fts_query(query):
+        """User text to an FTS5 expression: every word must appear, 'word*' is a prefix match"""
+        terms = []
+        for word in query.split():
+            prefix = word.endswith('*') and len(word) > 1
+            word = word.rstrip('*').replace('"', '""')
+            if word:
+                terms.append(f'"{word}"' + ('*' if prefix else ''))
+        return ' AND '.join(terms)
+    
+    def search(self, bot_id, query, limit=20):
+        """Newest matching lines for a bot, as dicts with time, stream and text"""
+        expression = self._fts_query(query)
+        if not expression:
+            return []
+        with self.reader_lock:
+            row = self.reader.execute('SELECT bot_num FROM log_bots WHERE bot_id = ?', (bot_id,)).fetchone()
+            if not row:
+                return []
+            bot_num = row[0]
+            low = self._rowid(bot_num, 0, 0)
+            high = self._rowid(bot_num + 1, 0, 0) - 1
+            rowids = [r[0] for r in self.reader.execute(
+                'SELECT rowid FROM log_fts WHERE log_fts MATCH ? AND rowid BETWEEN ? AND ? ORDER BY rowid DESC LIMIT ?',
+                (expression, low, high, limit))]
+    
+            results = []
+            members = {}
+            for rowid in rowids:
+                segment_no = (rowid >> self.LINE_BITS) & ((1 << self.SEGMENT_BITS) - 1)
+                line_no = rowid & ((1 << self.LINE_BITS) - 1)
+                member = self.reader.execute('''
+                    SELECT m.first_line, m.offset, m.length, s.path FROM log_members m
+                    JOIN log_segments s ON s.bot_num = m.bot_num AND s.segment_no = m.segment_no
+                    WHERE m.bot_num = ? AND m.segment_no = ? AND m.first_line <= ?
+                    ORDER BY m.first_line DESC LIMIT 1
+                ''', (bot_num, segment_no, line_no)).fetchone()
+                if not member:
+                    continue
+                if member not in members:
+                    try:
+                        members[member] = self._read_member(member[3], member[1], member[2])
+                    except OSError:
+                        members[member] = []
+                lines = members[member]
+                if line_no - member[0] < len(lines):
+                    results.append(lines[line_no - member[0]])
+        return results
+    
+    def tail(self, bot_id, lines=50):
+        """Most recent lines, from memory while the bot runs or from the archive afterwards"""
+        with self.lock:
+            if bot_id in self.tails:
+                return list(self.tails[bot_id])[-lines:]
+        collected = []
+        with self.reader_lock:
+            members = self.reader.execute('''
+                SELECT m.offset, m.length, s.path FROM log_members m
+                JOIN log_bots b ON b.bot_num = m.bot_num
+                JOIN log_segments s ON s.bot_num = m.bot_num AND s.segment_no = m.segment_no
+                WHERE b.bot_id = ? ORDER BY s.started DESC, m.first_line DESC
+            ''', (bot_id,))
+            for offset, length, path in members:
+                try:
+                    collected = [line['text'] for line in self._read_member(path, offset, length)] + collected
+                except OSError:
+                    continue
+                if len(collected) >= lines:
+                    break
+        return collected[-lines:]
+    
+    def stats(self):
+        """Archive totals for the admin view"""
+        with self.reader_lock:
+            row = self.reader.execute('SELECT COUNT(*), COALESCE(SUM(lines), 0), COALESCE(SUM(bytes), 0), COALESCE(SUM(raw_bytes), 0) FROM log_segments').fetchone()
+        return {'segments': row[0], 'lines': row[1], 'bytes': row[2], 'raw_bytes': row[3]}
+
+
 # bot_manager.py - Bot Process Management
+import resource
 import subprocess
 import psutil
 import signal
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-class BotManager:
+class BotLifecycle:
+    """Admission and bulk start shared by BotManager and ClusterController, which provide
+    db, storage and start_bot"""
+    
+    def _refusal(self, bot_id):
+        """Reason this bot's owner may not run it right now, None if they may"""
+        if self.db.is_bot_owner_banned(bot_id):
+            return {'success': False, 'message': '🚫 Your account is banned from hosting bots.'}
+        if self.storage and self.storage.thread:
+            bot = self.db.get_bot(bot_id)
+            if bot and self.storage.over_quota(bot[1]):
+                return {'success': False, 'message': '💽 Storage quota exceeded, free up space first.'}
+        return None
+    
+    def start_bots(self, bot_ids, progress=None):
+        """Start many bots, at most BULK_CONCURRENCY at a time"""
+        result = {'started': [], 'failed': []}
+        done = threading.Lock()
+        
+        def start(bot_id):
+            bot = self.db.get_bot(bot_id)
+            outcome = self.start_bot(bot_id, bot[4], bot[3]) if bot else {'success': False}
+            with done:
+                result['started' if outcome.get('success') else 'failed'].append(bot_id)
+                if progress:
+                    progress('start', len(result['started']) + len(result['failed']), len(bot_ids))
+        
+        with ThreadPoolExecutor(max_workers=Config.BULK_CONCURRENCY) as pool:
+            list(pool.map(start, bot_ids))
+        return result
+
+
+class BotManager(BotLifecycle):
     """Manage bot processes with resource monitoring [web:29][web:34]"""
     
-    def __init__(self, db):
+    def __init__(self, db, storage=None, restart_lost=True):
         self.db = db
+        self.storage = storage
+        self.restart_lost = restart_lost  # False on agents, where the controller decides what runs
         self.processes = {}
+        self.usage = {}
+        self._ps_cache = {}
+        self.core_placer = CorePlacer()
+        self.freezer = ProcessFreezer()
+        self.hibernated = {}
+        self.idle = {}
+        self.wake_latencies = deque(maxlen=200)
+        self.zygote = ZygoteClient() if Config.ZYGOTE_ENABLED else None
+        self.logs = LogArchive(db)
+        self.reconcile_thread = threading.Thread(target=self.reconcile, daemon=True)
+        self.reconcile_thread.start()
         self.monitoring_thread = threading.Thread(target=self._monitor_processes, daemon=True)
         self.monitoring_thread.start()
     
     def start_bot(self, bot_id, file_path, bot_type='python'):
         """Start a bot process in isolated environment"""
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        if bot_id in self.hibernated:
+            return self.wake_bot(bot_id)
+        if bot_id in self.processes and self.processes[bot_id]['process'].poll() is None:
+            return {'success': False, 'message': '❌ Bot is already running'}
         try:
             # Prepare command based on bot type
             if bot_type == 'python':
@@ -323,19 +1593,44 @@ class BotManager:
             else:
                 return {'success': False, 'message': 'Unsupported bot type'}
             
-            # Start process with resource limits
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=os.path.dirname(file_path)
-            )
+            # Start process with resource limits; output goes to spool files, unlike pipes they
+            # stay writable when the control plane exits, so survivors can be adopted
+            process = None
+            stdout, stderr = self.logs.open_spool(bot_id)
+            try:
+                if self.zygote and bot_type == 'python':
+                    try:
+                        with metrics.timer('bot_spawn_seconds', mode='zygote'):
+                            process = self.zygote.spawn(file_path, os.path.dirname(file_path), rlimits=Config.BOT_RLIMITS,
+                                                        stdout=stdout, stderr=stderr)
+                    except Exception as e:
+                        print(f"Zygote spawn failed, falling back to exec: {e}")
+                if process is None:
+                    # Own session so bots outlive a control-plane restart and can be adopted
+                    with metrics.timer('bot_spawn_seconds', mode='exec'):
+                        process = subprocess.Popen(
+                            cmd,
+                            stdout=stdout,
+                            stderr=stderr,
+                            cwd=os.path.dirname(file_path),
+                            env=bot_environment(),
+                            start_new_session=True,
+                            preexec_fn=self._apply_rlimits if Config.BOT_RLIMITS else None
+                        )
+            finally:
+                stdout.close()
+                stderr.close()
+                if process is None:
+                    self.logs.release_spool(bot_id)
+                else:
+                    self.logs.attach(bot_id, process)
             
             # Store process info
             self.processes[bot_id] = {
                 'process': process,
                 'start_time': time.time(),
-                'file_path': file_path
+                'file_path': file_path,
+                'cores': self.core_placer.assign(bot_id, process.pid)
             }
             
             # Update database
@@ -353,140 +1648,1523 @@ class BotManager:
                 'message': f'❌ Failed to start bot: {str(e)}'
             }
     
-    def stop_bot(self, bot_id):
-        """Stop a running bot process"""
+    @staticmethod
+    def _apply_rlimits():
+        """Runs in the child between fork and exec, like zygote.run_bot, so no bot code runs unlimited"""
+        for name, limits in Config.BOT_RLIMITS.items():
+            resource.setrlimit(getattr(resource, name), limits)
+    
+    def stop_bot(self, bot_id):
+        """Stop a running bot process"""
+        try:
+            result = self.stop_bots([bot_id])
+            if result['not_running']:
+                return {'success': False, 'message': '❌ Bot is not running'}
+            return {'success': True, 'message': '✅ Bot stopped successfully!'}
+        except Exception as e:
+            return {'success': False, 'message': f'❌ Error stopping bot: {str(e)}'}
+    
+    def restart_bot(self, bot_id):
+        """Restart a running or hibernated bot"""
+        bot = self.db.get_bot(bot_id)
+        if not bot:
+            return {'success': False, 'message': '❌ Bot not found'}
+        if bot_id not in self.processes and bot_id not in self.hibernated:
+            return {'success': False, 'message': '❌ Bot is not running'}
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        self.stop_bots([bot_id])
+        return self.start_bot(bot_id, bot[4], bot[3])
+    
+    def stop_bots(self, bot_ids, timeout=5, progress=None):
+        """Stop many bots at once: SIGTERM to all, one shared wait, then SIGKILL the stragglers
+        
+        progress(phase, done, total) is called from this thread as bots exit.
+        """
+        result = {'stopped': [], 'killed': [], 'not_running': []}
+        pending = {}
+        for bot_id in bot_ids:
+            if bot_id in self.processes:
+                # Unlist first so the monitor does not treat the exit as a crash
+                process = self.processes.pop(bot_id)['process']
+                try:
+                    # A frozen process would not see SIGTERM until thawed
+                    if self.hibernated.pop(bot_id, None):
+                        self.freezer.thaw(bot_id, process.pid)
+                    process.terminate()
+                except (psutil.NoSuchProcess, ProcessLookupError):
+                    pass
+                pending[bot_id] = process
+            elif self.hibernated.pop(bot_id, None):
+                result['stopped'].append(bot_id)
+            else:
+                result['not_running'].append(bot_id)
+        
+        total = len(pending) + len(result['stopped'])
+        deadline = time.monotonic() + timeout
+        while pending:
+            for bot_id in [b for b, p in pending.items() if p.poll() is not None]:
+                del pending[bot_id]
+                result['stopped'].append(bot_id)
+            if progress:
+                progress('stop', len(result['stopped']), total)
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        
+        # Force kill whatever did not respond
+        for bot_id, process in pending.items():
+            try:
+                process.kill()
+            except (psutil.NoSuchProcess, ProcessLookupError):
+                pass
+            result['killed'].append(bot_id)
+        for process in pending.values():
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        
+        for bot_id in result['stopped'] + result['killed']:
+            self.core_placer.release(bot_id)
+            self.freezer.remove(bot_id)
+            self.db.update_bot_status(bot_id, 'stopped')
+        if progress:
+            progress('stop', total, total)
+        return result
+    
+    def restart_bots(self, bot_ids, progress=None):
+        """Stop the running and hibernated bots together, then start them back with bounded concurrency"""
+        running = [b for b in bot_ids if b in self.processes or b in self.hibernated]
+        refused = [b for b in running if self._refusal(b)]
+        running = [b for b in running if b not in refused]
+        stopped = self.stop_bots(running, progress=progress)
+        started = self.start_bots(stopped['stopped'] + stopped['killed'], progress=progress)
+        started['failed'] += refused
+        stopped['not_running'] = [b for b in bot_ids if b not in running and b not in refused]
+        return dict(stopped, **started)
+    
+    def get_bot_logs(self, bot_id, lines=50):
+        """Get bot process logs, kept in the archive after the bot stops"""
+        return self.logs.tail(bot_id, lines) or ['No logs available']
+    
+    def search_logs(self, bot_id, query, limit=20):
+        """Full-text search over a bot's archived output, newest first"""
+        return self.logs.search(bot_id, query, limit)
+    
+    def get_bot_stats(self, bot_id):
+        """Get resource usage statistics"""
+        if bot_id in self.processes:
+            process = self.processes[bot_id]['process']
+            try:
+                ps = psutil.Process(process.pid)
+                uptime = time.time() - self.processes[bot_id]['start_time']
+                
+                return {
+                    'cpu_percent': ps.cpu_percent(interval=0.1),
+                    'memory_mb': ps.memory_info().rss / 1024 / 1024,
+                    'uptime_seconds': int(uptime),
+                    'status': ps.status()
+                }
+            except:
+                return None
+        return None
+    
+    @staticmethod
+    def _io_bytes(ps):
+        """Bytes read+written so far; on Linux the char counters include socket traffic"""
+        try:
+            io = ps.io_counters()
+        except (psutil.AccessDenied, AttributeError):
+            return None
+        return getattr(io, 'read_chars', io.read_bytes) + getattr(io, 'write_chars', io.write_bytes)
+    
+    def _track_idle(self, bot_id, cpu_percent, io_bytes):
+        """Seconds the bot has stayed under the CPU and I/O idle thresholds"""
+        now = time.time()
+        idle = self.idle.setdefault(bot_id, {'io': io_bytes, 'since': now})
+        io_delta = io_bytes - idle['io'] if io_bytes is not None and idle['io'] is not None else 0
+        idle['io'] = io_bytes
+        if cpu_percent > Config.HIBERNATE_CPU_PERCENT or io_delta > Config.HIBERNATE_IO_BYTES:
+            idle['since'] = now
+        return int(now - idle['since'])
+    
+    def sample_resources(self):
+        """Non-blocking per-bot usage sample (cpu_percent is measured since the last sample)"""
+        usage = {}
+        for bot_id, info in list(self.processes.items()):
+            pid = info['process'].pid
+            try:
+                ps = self._ps_cache.get(pid)
+                if ps is None:
+                    ps = self._ps_cache[pid] = psutil.Process(pid)
+                usage[bot_id] = {
+                    'pid': pid,
+                    'alive': info['process'].poll() is None,
+                    'cpu_percent': ps.cpu_percent(interval=None),
+                    'memory_mb': ps.memory_info().rss / 1024 / 1024,
+                    'uptime_seconds': int(time.time() - info['start_time']),
+                    'cores': info.get('cores'),
+                    'hibernated': bot_id in self.hibernated
+                }
+                usage[bot_id]['idle_seconds'] = self._track_idle(bot_id, usage[bot_id]['cpu_percent'], self._io_bytes(ps))
+                self.core_placer.sample(bot_id, usage[bot_id]['cpu_percent'])
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._ps_cache.pop(pid, None)
+                usage[bot_id] = {'pid': pid, 'alive': False, 'cpu_percent': 0, 'memory_mb': 0,
+                                 'uptime_seconds': 0, 'cores': info.get('cores')}
+        live_pids = {u['pid'] for u in usage.values()}
+        for pid in [p for p in self._ps_cache if p not in live_pids]:
+            del self._ps_cache[pid]
+        for bot_id in [b for b in self.idle if b not in usage]:
+            del self.idle[bot_id]
+        self.usage = usage
+        metrics.replace_gauges('bot_cpu_percent', [({'bot_id': b}, u['cpu_percent']) for b, u in usage.items()])
+        metrics.replace_gauges('bot_memory_mb', [({'bot_id': b}, u['memory_mb']) for b, u in usage.items()])
+        metrics.set_gauge('bots_running', len(usage))
+        metrics.set_gauge('bots_hibernated', len(self.hibernated))
+        return usage
+    
+    def hibernate_bot(self, bot_id, mode=None):
+        """Freeze an idle bot in place, or stop it entirely, until it is woken"""
+        mode = mode or Config.HIBERNATE_MODE or 'freeze'
+        if bot_id not in self.processes or bot_id in self.hibernated:
+            return {'success': False, 'message': '❌ Bot is not running'}
+        process = self.processes[bot_id]['process']
+        try:
+            if mode == 'freeze':
+                self.freezer.freeze(bot_id, process.pid)
+                if Config.HIBERNATE_SWAP_OUT:
+                    self.freezer.swap_out(bot_id, process.pid)
+            else:
+                self.stop_bots([bot_id])
+        except Exception as e:
+            return {'success': False, 'message': f'❌ Error hibernating bot: {str(e)}'}
+        self.hibernated[bot_id] = {'mode': mode, 'since': time.time()}
+        self.db.update_bot_status(bot_id, 'hibernated')
+        return {'success': True, 'message': '💤 Bot hibernated'}
+    
+    def wake_bot(self, bot_id):
+        """Thaw or respawn a hibernated bot, recording how long the wake-up took"""
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        state = self.hibernated.pop(bot_id, None)
+        if not state:
+            return {'success': False, 'message': '❌ Bot is not hibernated'}
+        started = time.perf_counter()
+        if state['mode'] == 'freeze':
+            process = self.processes[bot_id]['process']
+            try:
+                self.freezer.thaw(bot_id, process.pid)
+            except Exception as e:
+                return {'success': False, 'message': f'❌ Error waking bot: {str(e)}'}
+            self.db.update_bot_status(bot_id, 'running')
+            result = {'success': True, 'message': '✅ Bot woke up!', 'pid': process.pid}
+        else:
+            bot = self.db.get_bot(bot_id)
+            result = self.start_bot(bot_id, bot[4], bot[3])
+            if not result['success']:
+                return result
+        self.idle.pop(bot_id, None)
+        latency = time.perf_counter() - started
+        self.wake_latencies.append((bot_id, state['mode'], latency))
+        result['wake_seconds'] = latency
+        return result
+    
+    def hibernation_stats(self):
+        """Hibernated bot counts per mode and wake-up latency percentiles"""
+        latencies = sorted(l for _, _, l in self.wake_latencies)
+        
+        def pick(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+        
+        modes = [state['mode'] for state in self.hibernated.values()]
+        return {
+            'frozen': modes.count('freeze'),
+            'stopped': modes.count('stop'),
+            'wakeups': len(latencies),
+            'wake_p50': pick(0.5),
+            'wake_p95': pick(0.95)
+        }
+    
+    def _check_hibernation(self):
+        if not Config.HIBERNATE_MODE:
+            return
+        for bot_id, usage in list(self.usage.items()):
+            if (usage['alive'] and not usage['hibernated'] and usage.get('idle_seconds', 0) >= Config.HIBERNATE_IDLE_SECONDS
+                    and self.db.hibernation_allowed(bot_id)):
+                print(f"Hibernating idle bot {bot_id}")
+                self.hibernate_bot(bot_id)
+    
+    @staticmethod
+    def _find_live_process(bot):
+        """The stored PID if it is still this bot's process, else None"""
+        file_path, pid, last_started = bot[4], bot[8], bot[7]
+        if not pid:
+            return None
+        try:
+            ps = psutil.Process(pid)
+            if ps.status() == psutil.STATUS_ZOMBIE:
+                return None
+            # Zygote-forked bots keep the zygote's cmdline, so match those on cwd instead
+            cmdline = ps.cmdline()
+            if file_path not in cmdline and not (
+                    any(arg.endswith('zygote.py') for arg in cmdline) and ps.cwd() == os.path.dirname(file_path)):
+                return None
+            # A process created after the bot was last started is a reused PID
+            if last_started and ps.create_time() > datetime.fromisoformat(last_started).timestamp() + 5:
+                return None
+            return ps
+        except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError):
+            return None
+    
+    def reconcile(self):
+        """Adopt bots that survived a platform restart and restart the ones that did not"""
+        restarts = []
+        for bot in self.db.get_bots_by_status('running', 'hibernated'):
+            bot_id, status = bot[0], bot[5]
+            if bot_id in self.processes:
+                continue
+            ps = self._find_live_process(bot)
+            if ps:
+                self.processes[bot_id] = {
+                    'process': DetachedProcess(ps.pid),
+                    'start_time': ps.create_time(),
+                    'file_path': bot[4],
+                    'cores': self.core_placer.assign(bot_id, ps.pid),
+                    'adopted': True
+                }
+                self.logs.attach(bot_id, self.processes[bot_id]['process'])
+                if status == 'hibernated':
+                    self.hibernated[bot_id] = {'mode': 'freeze', 'since': time.time()}
+                print(f"Adopted bot {bot_id} (pid {ps.pid})")
+            elif status == 'hibernated':
+                # Stopped-mode hibernation has no process to adopt, it wakes on demand as before
+                self.hibernated[bot_id] = {'mode': 'stop', 'since': time.time()}
+            else:
+                restarts.append(bot)
+        
+        if not self.restart_lost:
+            # The controller may have placed these elsewhere meanwhile, it reschedules them if not
+            for bot in restarts:
+                self.db.update_bot_status(bot[0], 'stopped')
+            return
+        if not restarts:
+            return
+        print(f"Restarting {len(restarts)} bots, {Config.RECONCILE_CONCURRENCY} at a time")
+        
+        def restart(bot):
+            result = self.start_bot(bot[0], bot[4], bot[3])
+            if not result['success']:
+                self.db.update_bot_status(bot[0], 'error')
+            time.sleep(Config.RECONCILE_STAGGER_SECONDS)
+        
+        with ThreadPoolExecutor(max_workers=Config.RECONCILE_CONCURRENCY) as pool:
+            list(pool.map(restart, restarts))
+    
+    def rebalance_cores(self):
+        """Re-pin bots so per-core load stays even"""
+        pids = {bot_id: info['process'].pid for bot_id, info in list(self.processes.items())}
+        moves = self.core_placer.rebalance(pids)
+        for bot_id, cores in moves:
+            if bot_id in self.processes:
+                self.processes[bot_id]['cores'] = cores
+        return moves
+    
+    def _monitor_processes(self):
+        """Background thread to monitor all bot processes"""
+        last_rebalance = time.time()
+        while True:
+            try:
+                self.sample_resources()
+                self._check_hibernation()
+                if time.time() - last_rebalance >= Config.CORE_REBALANCE_SECONDS:
+                    self.rebalance_cores()
+                    last_rebalance = time.time()
+                
+                for bot_id in list(self.processes.keys()):
+                    process_info = self.processes[bot_id]
+                    process = process_info['process']
+                    
+                    # Check if process is still alive
+                    if process.poll() is not None:
+                        # Process died, check auto-restart (a frozen bot that died is woken by the restart)
+                        self.hibernated.pop(bot_id, None)
+                        self.freezer.remove(bot_id)
+                        bot = self.db.get_bot(bot_id)
+                        if bot and bot[12]:  # auto_restart enabled
+                            print(f"Auto-restarting bot {bot_id}")
+                            time.sleep(2)
+                            self.start_bot(bot_id, bot[4], bot[3])
+                        else:
+                            del self.processes[bot_id]
+                            self.core_placer.release(bot_id)
+                            self.db.update_bot_status(bot_id, 'stopped')
+                
+                time.sleep(10)  # Check every 10 seconds
+            except Exception as e:
+                print(f"Monitor error: {e}")
+                metrics.inc('monitor_errors_total')
+                time.sleep(10)
+    
+    def install_module(self, bot_id, module_name):
+        """Install a Python module for specific bot"""
+        try:
+            with metrics.timer('pip_install_seconds'):
+                result = subprocess.run(
+                    ['pip3', 'install', module_name],
+                    capture_output=True,
+                    text=True,
+                    timeout=60,
+                    env=bot_environment()  # Package build scripts are hosted code too
+                )
+            metrics.inc('pip_installs_total', result='ok' if result.returncode == 0 else 'failed')
+            
+            if result.returncode == 0:
+                # Log installation
+                cursor = self.db.conn.cursor()
+                cursor.execute('''
+                    INSERT INTO bot_modules (bot_id, module_name, installed_at)
+                    VALUES (?, ?, ?)
+                ''', (bot_id, module_name, datetime.now().isoformat()))
+                self.db.conn.commit()
+                
+                return {
+                    'success': True,
+                    'message': f'✅ Module "{module_name}" installed successfully!',
+                    'output': result.stdout
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': f'❌ Failed to install "{module_name}"',
+                    'error': result.stderr
+                }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'❌ Installation error: {str(e)}'
+            }
+
+
+# cluster.py - Multi-node Agents & Placement Scheduler
+import sys
+import hmac
+import socket
+import ipaddress
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class NodeAgent:
+    """Per-node agent that owns bot processes and reports capacity over HTTP"""
+    
+    def __init__(self, node_id=None, host=Config.AGENT_HOST, port=Config.AGENT_PORT, db_path=None):
+        # The API starts arbitrary files and pip installs, it must never be reachable unauthenticated
+        if not Config.CLUSTER_TOKEN and not self._is_loopback(host):
+            raise ValueError(f"Refusing to bind agent to {host} without CLUSTER_TOKEN set")
+        self.node_id = node_id or f"{socket.gethostname()}:{port}"
+        self.host = host
+        self.port = port
+        self.draining = False
+        self.db = Database(db_path or f"agent_{self.node_id.replace(':', '_')}.db")
+        self.manager = BotManager(self.db, restart_lost=False)
+    
+    @staticmethod
+    def _is_loopback(host):
+        if host == 'localhost':
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+    
+    def status(self):
+        mem = psutil.virtual_memory()
+        # The monitor thread owns sampling, a second sampler would split its cpu_percent and idle deltas
+        usage = self.manager.usage
+        bots = {bot_id: usage.get(bot_id) or {'pid': info['process'].pid, 'alive': True, 'cpu_percent': 0, 'memory_mb': 0}
+                for bot_id, info in list(self.manager.processes.items())}
+        return {
+            'node_id': self.node_id,
+            'draining': self.draining,
+            'cpu_count': psutil.cpu_count() or 1,
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'memory_total_mb': mem.total / 1024 / 1024,
+            'memory_available_mb': mem.available / 1024 / 1024,
+            'bots': bots,
+            'hibernated': {b: state['mode'] for b, state in self.manager.hibernated.items()},
+            'cores': self.manager.core_placer.occupancy()
+        }
+    
+    def _ensure_bot(self, payload):
+        """Mirror the controller's bot record so the local monitor can auto-restart it"""
+        if not self.db.get_bot(payload['bot_id']):
+            self.db.add_hosted_bot(payload['bot_id'], payload.get('user_id'), payload.get('bot_name'),
+                                   payload['bot_type'], payload['file_path'])
+        self.db.set_bot_hibernation(payload['bot_id'], payload.get('hibernate', False))
+    
+    def handle(self, method, path, payload):
+        """Dispatch an API call, returns (http_status, body)"""
+        parts = [p for p in path.split('/') if p]
+        
+        if method == 'GET' and parts == ['status']:
+            return 200, self.status()
+        if method == 'POST' and parts == ['drain']:
+            self.draining = True
+            return 200, {'success': True, 'draining': True}
+        if method == 'POST' and parts == ['undrain']:
+            self.draining = False
+            return 200, {'success': True, 'draining': False}
+        if method == 'POST' and parts == ['bots', 'bulk']:
+            operation = {'stop': self.manager.stop_bots, 'restart': self.manager.restart_bots}[payload['action']]
+            return 200, operation(payload['bot_ids'])
+        if method == 'POST' and parts == ['bots', 'start']:
+            if self.draining:
+                return 409, {'success': False, 'message': '❌ Node is draining'}
+            self._ensure_bot(payload)
+            return 200, self.manager.start_bot(payload['bot_id'], payload['file_path'], payload['bot_type'])
+        if len(parts) == 3 and parts[0] == 'bots':
+            bot_id, action = parts[1], parts[2]
+            if method == 'POST' and action == 'stop':
+                return 200, self.manager.stop_bot(bot_id)
+            if method == 'POST' and action == 'restart':
+                return 200, self.manager.restart_bot(bot_id)
+            if method == 'POST' and action == 'hibernate':
+                return 200, self.manager.hibernate_bot(bot_id, payload.get('mode'))
+            if method == 'POST' and action == 'wake':
+                return 200, self.manager.wake_bot(bot_id)
+            if method == 'POST' and action == 'install':
+                return 200, self.manager.install_module(bot_id, payload['module'])
+            if method == 'GET' and action == 'stats':
+                return 200, {'stats': self.manager.get_bot_stats(bot_id)}
+            if method == 'GET' and action == 'logs':
+                return 200, {'logs': self.manager.get_bot_logs(bot_id, int(payload.get('lines', 50)))}
+            if method == 'GET' and action == 'search':
+                return 200, {'matches': self.manager.search_logs(bot_id, payload['query'], int(payload.get('limit', 20)))}
+        return 404, {'success': False, 'message': 'Unknown endpoint'}
+    
+    def serve_forever(self):
+        agent = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self, method):
+                token = self.headers.get('X-Agent-Token') or ''
+                if Config.CLUSTER_TOKEN and not hmac.compare_digest(token.encode(), Config.CLUSTER_TOKEN.encode()):
+                    return self._reply(403, {'success': False, 'message': 'Forbidden'})
+                url = urlparse(self.path)
+                payload = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    payload.update(json.loads(self.rfile.read(length)))
+                try:
+                    code, body = agent.handle(method, url.path, payload)
+                except Exception as e:
+                    code, body = 500, {'success': False, 'message': f'❌ Agent error: {str(e)}'}
+                self._reply(code, body)
+            
+            def _reply(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_GET(self):
+                self._dispatch('GET')
+            
+            def do_POST(self):
+                self._dispatch('POST')
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer((self.host, self.port), Handler)
+        print(f"🛰 Agent {self.node_id} listening on {self.host}:{self.port}")
+        server.serve_forever()
+
+
+class AgentClient:
+    """Thin HTTP client for a NodeAgent"""
+    
+    def __init__(self, url, timeout=10):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        if Config.CLUSTER_TOKEN:
+            self.session.headers['X-Agent-Token'] = Config.CLUSTER_TOKEN
+    
+    def get(self, path, **params):
+        response = self.session.get(f"{self.url}{path}", params=params, timeout=self.timeout)
+        return response.json()
+    
+    def post(self, path, payload=None):
+        response = self.session.post(f"{self.url}{path}", json=payload or {}, timeout=self.timeout)
+        return response.json()
+
+
+class PlacementScheduler:
+    """Best-fit bin packing of bots onto nodes by memory and CPU headroom"""
+    
+    @staticmethod
+    def headroom(node):
+        """Free memory (MB) and CPU (cores) a node can still hand out"""
+        cpu_count = node['cpu_count']
+        memory = node['memory_available_mb'] - Config.NODE_MEMORY_RESERVE_MB
+        cpu = cpu_count * (1 - Config.NODE_CPU_RESERVE) - cpu_count * node['cpu_percent'] / 100
+        return memory, cpu
+    
+    @staticmethod
+    def choose(nodes, memory_mb, cpu_cores, exclude=()):
+        """Pick the node left tightest after placement, or None if nothing fits"""
+        best, best_score = None, None
+        for url, node in nodes.items():
+            if url in exclude or node.get('down') or node.get('draining'):
+                continue
+            free_memory, free_cpu = PlacementScheduler.headroom(node)
+            if free_memory < memory_mb or free_cpu < cpu_cores:
+                continue
+            score = (free_memory - memory_mb) / node['memory_total_mb'] + (free_cpu - cpu_cores) / node['cpu_count']
+            if best_score is None or score < best_score:
+                best, best_score = url, score
+        return best
+
+
+class ClusterController(BotLifecycle):
+    """Drop-in replacement for BotManager that places bots on remote NodeAgents
+    
+    Bot files must be reachable at the same path from every node (shared storage).
+    """
+    
+    def __init__(self, db, agent_urls, storage=None):
+        self.db = db
+        self.storage = storage
+        self.agents = {url: AgentClient(url) for url in agent_urls}
+        self.nodes = {}
+        self.placements = {}
+        self.usage = {}
+        self.hibernated = {}
+        self.evicted = {}  # bot_id -> node that lost it, a copy still running there must be stopped
+        self.lock = threading.RLock()
+        self.poll_nodes()
+        self.monitoring_thread = threading.Thread(target=self._monitor_nodes, daemon=True)
+        self.monitoring_thread.start()
+    
+    @property
+    def processes(self):
+        """Running bots keyed by bot_id, mirroring BotManager.processes"""
+        return {bot_id: {'node': url} for bot_id, url in self.placements.items()}
+    
+    def poll_nodes(self):
+        """Refresh node capacity and rebuild placements from agent reports"""
+        with self.lock:
+            placements = {}
+            for url, client in self.agents.items():
+                node = self.nodes.setdefault(url, {'missed': 0})
+                try:
+                    status = client.get('/status')
+                except requests.RequestException:
+                    node['missed'] += 1
+                    node['down'] = node['missed'] >= Config.CLUSTER_DOWN_AFTER
+                    placements.update({b: u for b, u in self.placements.items() if u == url and not node['down']})
+                    continue
+                node.update(status, missed=0, down=False)
+                for bot_id, usage in status['bots'].items():
+                    if self._stale(bot_id, url, placements):
+                        continue
+                    placements[bot_id] = url
+                    self.usage[bot_id] = usage
+                for bot_id in status.get('hibernated', {}):
+                    if self._stale(bot_id, url, placements):
+                        continue
+                    placements[bot_id] = url
+                    if bot_id not in self.hibernated:
+                        self.hibernated[bot_id] = url
+                        self.db.update_bot_status(bot_id, 'hibernated')
+            lost = [b for b, u in self.placements.items() if b not in placements]
+            for bot_id in lost:
+                self.evicted[bot_id] = self.placements[bot_id]
+            self.placements = placements
+            for bot_id in [b for b in self.hibernated if b not in placements]:
+                del self.hibernated[bot_id]
+            return lost
+    
+    def _stale(self, bot_id, url, placements):
+        """Fence a bot a node still reports after it was lost there or placed elsewhere
+        
+        A partitioned node that comes back must not keep a second copy polling the same token.
+        """
+        owner = placements.get(bot_id) or self.placements.get(bot_id)
+        if (owner is None or owner == url) and self.evicted.get(bot_id) != url:
+            return False
+        print(f"Stopping stale copy of bot {bot_id} on {url}")
+        try:
+            if self.agents[url].post(f'/bots/{bot_id}/stop').get('success') and self.evicted.get(bot_id) == url:
+                del self.evicted[bot_id]
+        except requests.RequestException:
+            pass  # Still fenced, retried on the next poll
+        return True
+    
+    def _demand(self, bot_id):
+        usage = self.usage.get(bot_id)
+        if usage and usage['memory_mb']:
+            return usage['memory_mb'], max(usage['cpu_percent'] / 100, Config.BOT_CPU_ESTIMATE)
+        return Config.BOT_MEMORY_ESTIMATE_MB, Config.BOT_CPU_ESTIMATE
+    
+    def _reserve(self, bot_id, exclude=()):
+        """Pick a node and hold the bot's demand on it until the next poll reports real usage"""
+        memory_mb, cpu_cores = self._demand(bot_id)
+        with self.lock:
+            url = PlacementScheduler.choose(self.nodes, memory_mb, cpu_cores, exclude)
+            if url:
+                self.nodes[url]['memory_available_mb'] -= memory_mb
+                self.nodes[url]['cpu_percent'] += cpu_cores * 100 / self.nodes[url]['cpu_count']
+        return url
+    
+    def _place(self, bot_id, file_path, bot_type, url=None):
+        url = url or self._reserve(bot_id)
+        if not url:
+            return {'success': False, 'message': '❌ No node has enough free capacity'}
+        bot = self.db.get_bot(bot_id)
+        result = self.agents[url].post('/bots/start', {
+            'bot_id': bot_id,
+            'user_id': bot[1] if bot else None,
+            'bot_name': bot[2] if bot else None,
+            'bot_type': bot_type,
+            'file_path': file_path,
+            'hibernate': self.db.hibernation_allowed(bot_id)  # Applies from this start on
+        })
+        if result.get('success'):
+            with self.lock:
+                self.placements[bot_id] = url
+                self.evicted.pop(bot_id, None)
+            self.db.update_bot_status(bot_id, 'running', result.get('pid'))
+            result['node'] = self.nodes[url].get('node_id', url)
+        return result
+    
+    def start_bot(self, bot_id, file_path, bot_type='python'):
+        """Start a bot on the best-fitting node"""
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        if bot_id in self.hibernated:
+            return self.wake_bot(bot_id)
+        if bot_id in self.placements:
+            return {'success': False, 'message': '❌ Bot is already running'}
+        try:
+            return self._place(bot_id, file_path, bot_type)
+        except requests.RequestException as e:
+            return {'success': False, 'message': f'❌ Failed to start bot: {str(e)}'}
+    
+    def stop_bot(self, bot_id):
+        """Stop a bot on whichever node hosts it"""
+        url = self.placements.get(bot_id)
+        if not url:
+            return {'success': False, 'message': '❌ Bot is not running'}
+        try:
+            result = self.agents[url].post(f'/bots/{bot_id}/stop')
+        except requests.RequestException as e:
+            return {'success': False, 'message': f'❌ Error stopping bot: {str(e)}'}
+        with self.lock:
+            self.placements.pop(bot_id, None)
+            self.hibernated.pop(bot_id, None)
+        self.db.update_bot_status(bot_id, 'stopped')
+        return result
+    
+    def restart_bot(self, bot_id):
+        """Restart a running or hibernated bot in place"""
+        url = self.placements.get(bot_id)
+        bot = self.db.get_bot(bot_id)
+        if not bot:
+            return {'success': False, 'message': '❌ Bot not found'}
+        if not url:
+            return {'success': False, 'message': '❌ Bot is not running'}
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        try:
+            return self.agents[url].post(f'/bots/{bot_id}/restart')
+        except requests.RequestException as e:
+            return {'success': False, 'message': f'❌ Error restarting bot: {str(e)}'}
+    
+    def wake_bot(self, bot_id):
+        """Wake a bot hibernated by its node's agent"""
+        refusal = self._refusal(bot_id)
+        if refusal:
+            return refusal
+        url = self.hibernated.pop(bot_id, None) or self.placements.get(bot_id)
+        if not url:
+            return {'success': False, 'message': '❌ Bot is not hibernated'}
+        try:
+            result = self.agents[url].post(f'/bots/{bot_id}/wake')
+        except requests.RequestException as e:
+            return {'success': False, 'message': f'❌ Error waking bot: {str(e)}'}
+        if result.get('success'):
+            self.db.update_bot_status(bot_id, 'running', result.get('pid'))
+        return result
+    
+    def _bulk_on_nodes(self, action, bot_ids, progress=None):
+        """Fan a bulk stop/restart out to every node hosting some of the bots, in parallel"""
+        by_node = {}
+        result = {'stopped': [], 'killed': [], 'not_running': [], 'started': [], 'failed': []}
+        for bot_id in bot_ids:
+            url = self.placements.get(bot_id)
+            if url:
+                by_node.setdefault(url, []).append(bot_id)
+            else:
+                result['not_running'].append(bot_id)
+        done = threading.Lock()
+        finished = [0]
+        
+        def run(url):
+            try:
+                outcome = self.agents[url].post('/bots/bulk', {'action': action, 'bot_ids': by_node[url]})
+            except requests.RequestException:
+                outcome = {'failed': by_node[url]}
+            with done:
+                for key, ids in outcome.items():
+                    result.setdefault(key, []).extend(ids)
+                finished[0] += len(by_node[url])
+                if progress:
+                    progress(action, finished[0], len(bot_ids) - len(result['not_running']))
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(by_node))) as pool:
+            list(pool.map(run, by_node))
+        return result
+    
+    def stop_bots(self, bot_ids, timeout=5, progress=None):
+        result = self._bulk_on_nodes('stop', bot_ids, progress)
+        with self.lock:
+            for bot_id in result['stopped'] + result['killed']:
+                self.placements.pop(bot_id, None)
+                self.hibernated.pop(bot_id, None)
+        for bot_id in result['stopped'] + result['killed']:
+            self.db.update_bot_status(bot_id, 'stopped')
+        return result
+    
+    def restart_bots(self, bot_ids, progress=None):
+        """Restart placed (running or hibernated) bots in place on their nodes; stopped bots stay stopped"""
+        refused = [b for b in bot_ids if self._refusal(b)]
+        result = self._bulk_on_nodes('restart', [b for b in bot_ids if b not in refused], progress)
+        result['failed'] += refused
+        return result
+    
+    def migrate_bot(self, bot_id):
+        """Move a bot off its current node onto the best other node"""
+        bot = self.db.get_bot(bot_id)
+        url = self.placements.get(bot_id)
+        if not bot or not url:
+            return {'success': False, 'message': '❌ Bot is not running'}
+        target = self._reserve(bot_id, exclude=(url,))
+        if not target:
+            return {'success': False, 'message': '❌ No node has enough free capacity'}
+        try:
+            self.agents[url].post(f'/bots/{bot_id}/stop')
+        except requests.RequestException:
+            pass  # Node may already be gone, place the bot anyway
+        with self.lock:
+            self.placements.pop(bot_id, None)
+        return self._place(bot_id, bot[4], bot[3], url=target)
+    
+    def drain_node(self, url):
+        """Stop placing on a node and migrate its bots elsewhere"""
+        self.agents[url].post('/drain')
+        with self.lock:
+            self.nodes[url]['draining'] = True
+        return self.rebalance()
+    
+    def rebalance(self):
+        """Migrate bots away from draining nodes and reschedule bots from dead ones"""
+        moved = []
+        for bot_id, url in list(self.placements.items()):
+            node = self.nodes.get(url, {})
+            if node.get('draining') or node.get('down'):
+                result = self.migrate_bot(bot_id)
+                moved.append((bot_id, result.get('success', False)))
+        return moved
+    
+    def get_bot_logs(self, bot_id, lines=50):
+        # Archives stay on whichever node ran the bot, so a stopped bot's logs may be anywhere
+        url = self.placements.get(bot_id)
+        for url in [url] if url else [u for u, n in self.nodes.items() if not n.get('down')]:
+            try:
+                logs = self.agents[url].get(f'/bots/{bot_id}/logs', lines=lines)['logs']
+            except requests.RequestException:
+                continue
+            if logs != ['No logs available']:
+                return logs
+        return ['No logs available']
+    
+    def search_logs(self, bot_id, query, limit=20):
+        """Search every live node, a bot that migrated has history on each node it ran on"""
+        matches = []
+        for url, node in self.nodes.items():
+            if node.get('down'):
+                continue
+            try:
+                matches += self.agents[url].get(f'/bots/{bot_id}/search', query=query, limit=limit)['matches']
+            except requests.RequestException:
+                continue
+        return sorted(matches, key=lambda line: line['time'], reverse=True)[:limit]
+    
+    def get_bot_stats(self, bot_id):
+        url = self.placements.get(bot_id)
+        if not url:
+            return None
+        try:
+            return self.agents[url].get(f'/bots/{bot_id}/stats')['stats']
+        except requests.RequestException:
+            return None
+    
+    def install_module(self, bot_id, module_name):
+        """Install on the hosting node, or the first reachable one if the bot is stopped"""
+        url = self.placements.get(bot_id) or next((u for u, n in self.nodes.items() if not n.get('down')), None)
+        if not url:
+            return {'success': False, 'message': '❌ No node available'}
+        try:
+            return self.agents[url].post(f'/bots/{bot_id}/install', {'module': module_name})
+        except requests.RequestException as e:
+            return {'success': False, 'message': f'❌ Installation error: {str(e)}'}
+    
+    def check_nodes(self):
+        """Poll every node once and reschedule the bots a dead node took down"""
+        lost = self.poll_nodes()
+        for bot_id in lost:
+            bot = self.db.get_bot(bot_id)
+            if bot and bot[5] == 'running' and bot[12]:  # auto_restart enabled
+                print(f"Rescheduling bot {bot_id} lost by its node")
+                self._place(bot_id, bot[4], bot[3])
+            elif bot:
+                self.db.update_bot_status(bot_id, 'stopped')
+        self.rebalance()
+    
+    def _monitor_nodes(self):
+        """Background thread to track node health and reschedule lost bots"""
+        while True:
+            try:
+                time.sleep(Config.CLUSTER_POLL_SECONDS)
+                self.check_nodes()
+            except Exception as e:
+                print(f"Cluster monitor error: {e}")
+
+
+# loop_monitor.py - Event-loop Lag Detector & Sampling Profiler
+import asyncio
+import logging
+import logging.handlers
+import sys
+import traceback
+from collections import Counter, deque
+
+class LoopMonitor:
+    """Measures event-loop scheduling delay and captures the stack of whatever blocks it"""
+    
+    # Leaf frames of threads parked waiting for work, these are not time spent computing
+    IDLE_FRAMES = {('selectors.py', 'select'), ('threading.py', 'wait'), ('queue.py', 'get'),
+                   ('socket.py', 'accept'), ('socketserver.py', 'serve_forever')}
+    
+    def __init__(self, interval=Config.LOOP_LAG_INTERVAL, threshold=Config.LOOP_STALL_SECONDS,
+                 log_path=Config.PERF_LOG_PATH):
+        self.interval = interval
+        self.threshold = threshold
+        self.log_path = log_path
+        self.log = logging.getLogger('perf')
+        self.loop = None
+        self.loop_thread = None
+        self.heartbeat = time.monotonic()
+        self.lags = deque(maxlen=int(600 / interval))  # Last ~10 minutes
+        self.stalls = deque(maxlen=20)
+        self._stall = None
+        self.last_profile = None
+        self._profiling = threading.Lock()
+    
+    def start(self, loop):
+        """Begin monitoring; must be called from the loop's own thread"""
+        if self.loop_thread:
+            return
+        if not self.log.handlers:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(self.log_path, maxBytes=1024 * 1024, backupCount=3)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            self.log.addHandler(handler)
+            self.log.setLevel(logging.INFO)
+            self.log.propagate = False
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name='loop-watchdog', daemon=True).start()
+    
+    async def _heartbeat(self):
+        """Sleep a fixed interval and record how late the loop woke us up"""
+        while True:
+            expected = self.loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self.loop.time() - expected)
+            self.heartbeat = time.monotonic()
+            self.lags.append(lag)
+            metrics.observe('event_loop_lag_seconds', lag)
+    
+            stall, self._stall = self._stall, None
+            if stall:
+                stall['seconds'] = lag
+                self.log.warning(f"Event loop stall ended after {lag:.3f}s")
+            elif lag > self.threshold:
+                self.log.warning(f"Event loop lagged {lag:.3f}s")
+            if lag > self.threshold:
+                metrics.inc('event_loop_stalls_total')
+    
+    def _watchdog(self):
+        """Background thread: grab the loop thread's stack while it is still stuck"""
+        while True:
+            time.sleep(self.interval / 2)
+            beat = self.heartbeat
+            age = time.monotonic() - beat - self.interval
+            if age <= self.threshold or self._stall:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame)
+            del frame
+            if self.heartbeat != beat:
+                continue  # Loop recovered while we were capturing
+            stall = {
+                'time': datetime.now(),
+                'seconds': age,
+                'frames': [(os.path.basename(f.filename), f.lineno, f.name) for f in frames]
+            }
+            self._stall = stall
+            self.stalls.append(stall)
+            self.log.warning(f"Event loop blocked for {age:.3f}s, loop thread stack:\n"
+                             + "".join(traceback.format_list(frames)))
+    
+    def lag_stats(self):
+        """Percentiles of recent scheduling delay in seconds"""
+        lags = sorted(self.lags)
+        if not lags:
+            return {'samples': 0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0, 'stalls': len(self.stalls)}
+        return {
+            'samples': len(lags),
+            'p50': lags[len(lags) // 2],
+            'p99': lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+            'max': lags[-1],
+            'stalls': len(self.stalls)
+        }
+    
+    def _cpu_ns(self, native_ids):
+        """Nanoseconds each thread has spent on a CPU, None where /proc does not tell"""
+        times = {}
+        for tid in native_ids:
+            try:
+                with open(f'/proc/self/task/{tid}/schedstat') as f:
+                    times[tid] = int(f.read().split()[0])
+            except (OSError, ValueError, IndexError):
+                times[tid] = None
+        return times
+    
+    def _idle(self, frame, is_loop, ran):
+        """Whether a sampled thread is parked waiting rather than running code
+        
+        ran: whether it got CPU time since the last sample, None if unknown. Its run state
+        would not do, a thread waiting for the GIL sleeps too. On the loop thread blocking
+        calls are exactly what we hunt, so only the selector wait is idle there.
+        """
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in self.IDLE_FRAMES:
+            return True
+        if is_loop or ran is None:
+            return False
+        return not ran
+    
+    def profile(self, seconds, interval=Config.PROFILE_SAMPLE_INTERVAL):
+        """Sample every thread's stack for N seconds; blocks, so run it in an executor"""
+        if not self._profiling.acquire(blocking=False):
+            return None
         try:
-            if bot_id in self.processes:
-                process_info = self.processes[bot_id]
-                process = process_info['process']
-                
-                # Gracefully terminate
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()  # Force kill if not responding
-                
-                del self.processes[bot_id]
-                self.db.update_bot_status(bot_id, 'stopped')
-                
-                return {'success': True, 'message': '✅ Bot stopped successfully!'}
-            else:
-                return {'success': False, 'message': '❌ Bot is not running'}
-        except Exception as e:
-            return {'success': False, 'message': f'❌ Error stopping bot: {str(e)}'}
+            me = threading.get_ident()
+            stacks = Counter()
+            leaves = Counter()
+            samples = loop_busy = 0
+            last_cpu, last_sample = {}, time.monotonic_ns()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                threads = {t.ident: t for t in threading.enumerate()}
+                cpu = self._cpu_ns(t.native_id for t in threads.values())
+                # A thread that only woke to poll is still idle, busy means a tenth of the interval on CPU
+                sampled = time.monotonic_ns()
+                busy_ns, last_sample = (sampled - last_sample) // 10, sampled
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    native_id = getattr(threads.get(ident), 'native_id', None)
+                    spent, before = cpu.get(native_id), last_cpu.get(native_id)
+                    ran = spent - before >= busy_ns if spent is not None and before is not None else None
+                    if self._idle(frame, ident == self.loop_thread, ran):
+                        continue
+                    frames = []
+                    while frame is not None:
+                        frames.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    thread = 'event-loop' if ident == self.loop_thread else getattr(threads.get(ident), 'name', str(ident))
+                    stacks[';'.join([thread] + frames[::-1])] += 1
+                    leaves[frames[0]] += 1
+                    if ident == self.loop_thread:
+                        loop_busy += 1
+                last_cpu = cpu
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._profiling.release()
     
-    def restart_bot(self, bot_id):
-        """Restart a bot"""
-        bot = self.db.get_bot(bot_id)
-        if bot:
-            self.stop_bot(bot_id)
-            time.sleep(1)
-            return self.start_bot(bot_id, bot[4], bot[3])
-        return {'success': False, 'message': '❌ Bot not found'}
+        # Collapsed stacks, render with flamegraph.pl or speedscope
+        path = os.path.join(os.path.dirname(self.log_path) or '.', f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
     
-    def get_bot_logs(self, bot_id, lines=50):
-        """Get bot process logs"""
-        if bot_id in self.processes:
-            process = self.processes[bot_id]['process']
+        self.last_profile = {
+            'time': datetime.now(),
+            'seconds': seconds,
+            'samples': samples,
+            'loop_busy': loop_busy / samples if samples else 0.0,
+            'top': leaves.most_common(10),
+            'path': path
+        }
+        self.log.info(f"Profiled {seconds}s, {samples} samples, loop busy {self.last_profile['loop_busy']:.0%}, "
+                      f"top: {', '.join(f'{name} x{count}' for name, count in self.last_profile['top'][:5])}, "
+                      f"stacks in {path}")
+        return self.last_profile
+
+
+# storage_accountant.py - Incremental Disk Usage Tracking & Quotas
+import ctypes
+import ctypes.util
+import errno
+import select
+import stat
+import struct
+import threading
+import time
+from collections import deque
+
+class StorageAccountant:
+    """Keeps per-bot and per-user byte counts for bots/{user_id}/{bot_id} up to date from
+    inotify events, with a slow rolling rescan to correct drift and cover unwatched bots"""
+    
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_DONT_FOLLOW = 0x2000000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW)
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self, db, root='bots', on_quota=None):
+        self.db = db
+        self.root = os.path.abspath(root)
+        self.on_quota = on_quota  # (level, user_id, used_bytes, quota_bytes), level: warn/over/enforce
+        self.lock = threading.Lock()
+        self.fd = None
+        self.libc = None
+        self.wds = {}  # wd -> directory
+        self.dir_wds = {}  # directory -> wd
+        self.files = {}  # directory -> {name: bytes}
+        self.bot_dirs = {}  # (user_id, bot_id) -> directories tracked for that bot
+        self.bot_bytes = {}
+        self.user_bytes = {}
+        self.unwatched = set()  # Bots that hit the inotify watch limit, kept accurate by scans only
+        self.quota_state = {}  # user_id -> {'level', 'since'}
+        self._dirty_users = set()
+        self._reconcile_queue = deque()
+        self._reconcile_per_tick = 1
+        self.last_reconcile = None
+        self.thread = None
+    
+    def start(self):
+        """Initial scan, then follow changes in a background thread"""
+        if self.thread:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if hasattr(self.libc, 'inotify_init1'):
+            fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            self.fd = fd if fd >= 0 else None
+        if self.fd is None:
+            print("⚠️ inotify unavailable, storage accounting falls back to periodic scans")
+        self._full_sync()
+        self.thread = threading.Thread(target=self._run, name='storage-accountant', daemon=True)
+        self.thread.start()
+    
+    def usage(self, user_id, bot_id=None):
+        """Bytes used by one bot, or by all of a user's bots"""
+        if bot_id is None:
+            return self.user_bytes.get(user_id, 0)
+        return self.bot_bytes.get((user_id, bot_id), 0)
+    
+    def quota(self, user_id):
+        """Storage quota in bytes from the user's tier"""
+        user = self.db.get_user(user_id)
+        megabytes = Config.PREMIUM_MAX_STORAGE_MB if user and user[3] else Config.MAX_STORAGE_MB
+        return megabytes * 1024 * 1024
+    
+    def over_quota(self, user_id):
+        return self.usage(user_id) > self.quota(user_id)
+    
+    def summary(self):
+        """Totals for the admin stats view"""
+        with self.lock:
+            users = sorted(self.user_bytes.items(), key=lambda item: -item[1])
+            return {
+                'total_bytes': sum(self.user_bytes.values()),
+                'bots': len(self.bot_bytes),
+                'watches': len(self.wds),
+                'unwatched': len(self.unwatched),
+                'over_quota': sum(1 for s in self.quota_state.values() if s['level'] in ('over', 'enforced')),
+                'top_users': users[:3],
+                'inotify': self.fd is not None
+            }
+    
+    def _owner(self, path):
+        """(user_id, bot_id) for a path inside a bot directory, None above that level"""
+        parts = os.path.relpath(path, self.root).split(os.sep)
+        if len(parts) < 2 or not parts[0].isdigit() or parts[0] == '..':
+            return None
+        return int(parts[0]), parts[1]
+    
+    def _add(self, key, delta):
+        if not delta:
+            return
+        with self.lock:
+            self.bot_bytes[key] = self.bot_bytes.get(key, 0) + delta
+            self.user_bytes[key[0]] = self.user_bytes.get(key[0], 0) + delta
+        self._dirty_users.add(key[0])
+    
+    def _watch(self, directory, key=None):
+        if self.fd is None or directory in self.dir_wds:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC and key:
+                self.unwatched.add(key)  # fs.inotify.max_user_watches reached
+            return False
+        self.wds[wd] = directory
+        self.dir_wds[directory] = wd
+        return True
+    
+    def _unwatch(self, directory):
+        wd = self.dir_wds.pop(directory, None)
+        if wd is not None:
+            self.wds.pop(wd, None)
+            if self.fd is not None:
+                self.libc.inotify_rm_watch(self.fd, wd)
+    
+    @staticmethod
+    def _size(st):
+        """Allocated bytes like du, so sparse files cannot dodge the quota by size alone"""
+        return st.st_blocks * 512 if stat.S_ISREG(st.st_mode) else 0
+    
+    def _set_file(self, directory, name):
+        """Re-stat one file; idempotent, so coalesced or reordered events are harmless"""
+        key = self._owner(directory)
+        if key is None or directory not in self.files:
+            return
+        try:
+            st = os.lstat(os.path.join(directory, name))
+        except OSError:
+            st = None
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            self._sync_tree(os.path.join(directory, name))
+            return
+        entries = self.files[directory]
+        old = entries.pop(name, 0)
+        new = 0
+        if st is not None:
+            new = entries[name] = self._size(st)
+        self._add(key, new - old)
+    
+    def _sync_tree(self, top):
+        """Walk one bot's subtree, replacing tracked sizes; returns the correction applied"""
+        key = self._owner(top)
+        if key is None:
+            return 0
+        seen = set()
+        delta = 0
+        all_watched = True
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            # Watch before listing, anything created in between is caught by an event
+            all_watched = self._watch(directory, key) and all_watched
+            entries = {}
             try:
-                stdout, stderr = process.communicate(timeout=0.1)
-                logs = stdout.decode() + stderr.decode()
-                return logs.split('\n')[-lines:]
-            except:
-                return ['No logs available']
-        return ['Bot is not running']
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            else:
+                                entries[entry.name] = self._size(entry.stat(follow_symlinks=False))
+                        except OSError:
+                            pass
+            except OSError:
+                continue
+            seen.add(directory)
+            delta += sum(entries.values()) - sum(self.files.get(directory, {}).values())
+            self.files[directory] = entries
     
-    def get_bot_stats(self, bot_id):
-        """Get resource usage statistics"""
-        if bot_id in self.processes:
-            process = self.processes[bot_id]['process']
+        prefix = top + os.sep
+        tracked = self.bot_dirs.setdefault(key, set())
+        for directory in [d for d in tracked if (d == top or d.startswith(prefix)) and d not in seen]:
+            delta -= sum(self.files.pop(directory, {}).values())
+            self._unwatch(directory)
+            tracked.discard(directory)
+        tracked |= seen
+        if all_watched and top == os.path.join(self.root, str(key[0]), key[1]):
+            self.unwatched.discard(key)
+        self._add(key, delta)
+        if not tracked:
+            self._forget(key)
+        return delta
+    
+    def _drop_tree(self, top):
+        """A directory was deleted or moved away, discount everything under it"""
+        prefix = top + os.sep
+        for key, tracked in list(self.bot_dirs.items()):
+            gone = [d for d in tracked if d == top or d.startswith(prefix)]
+            if not gone:
+                continue
+            self._add(key, -sum(sum(self.files.pop(d, {}).values()) for d in gone))
+            for directory in gone:
+                self._unwatch(directory)
+                tracked.discard(directory)
+            if not tracked:
+                self._forget(key)
+        for directory in [d for d in self.dir_wds if d.startswith(prefix)]:
+            self._unwatch(directory)
+    
+    def _forget(self, key):
+        with self.lock:
+            self.bot_dirs.pop(key, None)
+            self.bot_bytes.pop(key, None)
+            self.unwatched.discard(key)
+            if not any(k[0] == key[0] for k in self.bot_bytes):
+                self.user_bytes.pop(key[0], None)
+    
+    def _bot_directories(self):
+        """Every bots/{user_id}/{bot_id} directory currently on disk"""
+        found = []
+        try:
+            users = [e.path for e in os.scandir(self.root) if e.is_dir(follow_symlinks=False) and e.name.isdigit()]
+        except OSError:
+            return found
+        for user_dir in users:
+            self._watch(user_dir)
             try:
-                ps = psutil.Process(process.pid)
-                uptime = time.time() - self.processes[bot_id]['start_time']
-                
-                return {
-                    'cpu_percent': ps.cpu_percent(interval=0.1),
-                    'memory_mb': ps.memory_info().rss / 1024 / 1024,
-                    'uptime_seconds': int(uptime),
-                    'status': ps.status()
-                }
-            except:
-                return None
-        return None
+                found.extend(e.path for e in os.scandir(user_dir) if e.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return found
     
-    def _monitor_processes(self):
-        """Background thread to monitor all bot processes"""
+    def _full_sync(self):
+        """Rescan everything, used at startup and after an inotify queue overflow"""
+        self._watch(self.root)
+        bot_dirs = self._bot_directories()
+        for directory in bot_dirs:
+            self._sync_tree(directory)
+        on_disk = set(bot_dirs)
+        for key in [k for k in self.bot_dirs if os.path.join(self.root, str(k[0]), k[1]) not in on_disk]:
+            self._drop_tree(os.path.join(self.root, str(key[0]), key[1]))
+        self.last_reconcile = datetime.now()
+    
+    def _read_events(self):
+        """Drain the inotify queue, returning the files whose size must be re-read"""
+        dirty = set()
         while True:
             try:
-                for bot_id in list(self.processes.keys()):
-                    process_info = self.processes[bot_id]
-                    process = process_info['process']
-                    
-                    # Check if process is still alive
-                    if process.poll() is not None:
-                        # Process died, check auto-restart
-                        bot = self.db.get_bot(bot_id)
-                        if bot and bot[13]:  # auto_restart enabled
-                            print(f"Auto-restarting bot {bot_id}")
-                            time.sleep(2)
-                            self.start_bot(bot_id, bot[4], bot[3])
+                buf = os.read(self.fd, 256 * 1024)
+            except BlockingIOError:
+                return dirty
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = self.EVENT.unpack_from(buf, offset)
+                name = os.fsdecode(buf[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b'\0'))
+                offset += self.EVENT.size + length
+                metrics.inc('storage_events_total')
+    
+                if mask & self.IN_Q_OVERFLOW:
+                    print("⚠️ inotify queue overflowed, rescanning bot storage")
+                    self._full_sync()
+                    dirty.clear()
+                    continue
+                directory = self.wds.get(wd)
+                if mask & self.IN_IGNORED:
+                    if directory and self.dir_wds.get(directory) == wd:
+                        del self.dir_wds[directory]
+                    self.wds.pop(wd, None)
+                    continue
+                if directory is None or not name:
+                    continue
+    
+                path = os.path.join(directory, name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        if directory == self.root:
+                            self._watch(path)
+                            for bot_dir in [e.path for e in os.scandir(path) if e.is_dir(follow_symlinks=False)]:
+                                self._sync_tree(bot_dir)
                         else:
-                            del self.processes[bot_id]
-                            self.db.update_bot_status(bot_id, 'stopped')
-                
-                time.sleep(10)  # Check every 10 seconds
+                            self._sync_tree(path)
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        self._drop_tree(path)
+                else:
+                    dirty.add((directory, name))
+    
+    def _check_quotas(self):
+        """Warn near the limit, alert when over it, stop the user's bots once the grace period ends"""
+        now = time.time()
+        users = self._dirty_users | {u for u, s in self.quota_state.items() if s['level'] == 'over'}
+        self._dirty_users = set()
+        for user_id in users:
+            used = self.usage(user_id)
+            try:
+                self.db.update_storage_used(user_id, used)
+                quota = self.quota(user_id)
             except Exception as e:
-                print(f"Monitor error: {e}")
-                time.sleep(10)
+                print(f"Storage quota check error for {user_id}: {e}")
+                continue
+            state = self.quota_state.setdefault(user_id, {'level': 'ok', 'since': now})
+            level = state['level']
     
-    def install_module(self, bot_id, module_name):
-        """Install a Python module for specific bot"""
-        try:
-            result = subprocess.run(
-                ['pip3', 'install', module_name],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            
-            if result.returncode == 0:
-                # Log installation
-                cursor = self.db.conn.cursor()
-                cursor.execute('''
-                    INSERT INTO bot_modules (bot_id, module_name, installed_at)
-                    VALUES (?, ?, ?)
-                ''', (bot_id, module_name, datetime.now().isoformat()))
-                self.db.conn.commit()
-                
-                return {
-                    'success': True,
-                    'message': f'✅ Module "{module_name}" installed successfully!',
-                    'output': result.stdout
-                }
+            if used > quota:
+                if level in ('ok', 'warn'):
+                    level = 'over'
+                    state['since'] = now
+                    self._notify('over', user_id, used, quota)
+                elif level == 'over' and now - state['since'] >= Config.STORAGE_GRACE_SECONDS:
+                    level = 'enforced'
+                    self._notify('enforce', user_id, used, quota)
+            elif used >= quota * Config.STORAGE_WARN_RATIO:
+                if level == 'ok':
+                    self._notify('warn', user_id, used, quota)
+                level = 'warn'
             else:
-                return {
-                    'success': False,
-                    'message': f'❌ Failed to install "{module_name}"',
-                    'error': result.stderr
-                }
-        except Exception as e:
-            return {
-                'success': False,
-                'message': f'❌ Installation error: {str(e)}'
-            }
+                level = 'ok'
+    
+            if level == 'ok':
+                self.quota_state.pop(user_id, None)
+            else:
+                state['level'] = level
+    
+    def _notify(self, level, user_id, used, quota):
+        metrics.inc('storage_quota_events_total', level=level)
+        print(f"💽 Storage {level} for user {user_id}: {used / 1024 / 1024:.1f} / {quota / 1024 / 1024:.0f} MB")
+        if self.on_quota:
+            try:
+                self.on_quota(level, user_id, used, quota)
+            except Exception as e:
+                print(f"Storage quota handler error: {e}")
+    
+    def _reconcile_step(self):
+        """Rescan a few bots per tick so the whole tree is covered once per reconcile period"""
+        if not self._reconcile_queue:
+            bot_dirs = self._bot_directories()
+            self._reconcile_queue.extend(bot_dirs)
+            self._reconcile_per_tick = max(1, -(-len(bot_dirs) // Config.STORAGE_RECONCILE_SECONDS))
+            self.last_reconcile = datetime.now()
+        for _ in range(min(self._reconcile_per_tick, len(self._reconcile_queue))):
+            drift = self._sync_tree(self._reconcile_queue.popleft())
+            if drift:
+                metrics.inc('storage_reconcile_drift_bytes', abs(drift))
+    
+    def _run(self):
+        now = time.monotonic()
+        next_tick = now + 1
+        next_flush = now + Config.STORAGE_FLUSH_SECONDS
+        next_fallback = now + Config.STORAGE_FALLBACK_SCAN_SECONDS
+        while True:
+            try:
+                timeout = max(0, next_tick - time.monotonic())
+                if self.fd is not None:
+                    ready, _, _ = select.select([self.fd], [], [], timeout)
+                    if ready:
+                        # Keep draining so the kernel queue never overflows, but stat each file once per window
+                        dirty = set()
+                        deadline = time.monotonic() + Config.STORAGE_DEBOUNCE_SECONDS
+                        while True:
+                            dirty |= self._read_events()
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            select.select([self.fd], [], [], remaining)
+                        for directory, name in dirty:
+                            self._set_file(directory, name)
+                else:
+                    time.sleep(timeout)
+    
+                now = time.monotonic()
+                if now < next_tick:
+                    continue
+                next_tick = now + 1
+                self._reconcile_step()
+    
+                if now >= next_fallback:
+                    next_fallback = now + Config.STORAGE_FALLBACK_SCAN_SECONDS
+                    if self.fd is None:
+                        self._full_sync()
+                    else:
+                        for user_id, bot_id in list(self.unwatched):
+                            self._sync_tree(os.path.join(self.root, str(user_id), bot_id))
+    
+                if now >= next_flush:
+                    next_flush = now + Config.STORAGE_FLUSH_SECONDS
+                    self._check_quotas()
+                    metrics.set_gauge('storage_tracked_bytes', sum(self.user_bytes.values()))
+                    metrics.set_gauge('storage_inotify_watches', len(self.wds))
+                    metrics.set_gauge('storage_unwatched_bots', len(self.unwatched))
+            except Exception as e:
+                print(f"Storage accountant error: {e}")
 
 
 # main_bot.py - Main Telegram Bot with Advanced UI
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
+import asyncio
 import zipfile
 import shutil
 import uuid
 
-db = Database()
 validator = CodeValidator()
-bot_manager = BotManager(db)
+loop_monitor = LoopMonitor()
+
+# Built by init_control_plane() from main(); importing this module or running an agent must not
+# open the controller database or start a bot manager that reconciles its bots
+db = None
+bot_manager = None
+storage = None
+
+def init_control_plane():
+    """Create the controller's database, bot manager and storage accountant"""
+    global db, bot_manager, storage
+    db = Database()
+    storage = StorageAccountant(db)
+    if Config.STORAGE_ACCOUNTING_ENABLED:
+        storage.start()  # Initial scan first, so startup reconcile already enforces quotas
+    if Config.CLUSTER_AGENTS:
+        bot_manager = ClusterController(db, Config.CLUSTER_AGENTS, storage=storage)
+    else:
+        bot_manager = BotManager(db, storage=storage)
 
 # Beautiful UI Templates
 class BotUI:
@@ -525,11 +3203,13 @@ class BotUI:
              InlineKeyboardButton("📜 Logs", callback_data="admin_logs")],
             [InlineKeyboardButton("📢 Broadcast", callback_data="admin_broadcast"),
              InlineKeyboardButton("⚙️ System Settings", callback_data="admin_settings")],
+            [InlineKeyboardButton("🐢 Performance", callback_data="admin_perf")],
             [InlineKeyboardButton("🔙 Back", callback_data="back_main")]
         ]
         return InlineKeyboardMarkup(keyboard)
 
 # Bot Handlers
+@metrics.timed('handler_seconds', handler='start_command')
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     db.add_user(user.id, user.username, user.first_name)
@@ -572,6 +3252,7 @@ Powered by 𝙂𝘼𝘿𝙂𝙀𝙏 𝑷𝑹𝑬𝑴𝑰𝑼𝑴 𝒁𝑶𝑵
         parse_mode='Markdown'
     )
 
+@metrics.timed('handler_seconds', handler='handle_file_upload')
 async def handle_file_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bot file uploads with validation [web:1][web:19]"""
     user_id = update.effective_user.id
@@ -579,6 +3260,17 @@ async def handle_file_upload(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Check bot limit
     user = db.get_user(user_id)
+    if user and user[4]:
+        await update.message.reply_text("🚫 Your account is banned from hosting bots.")
+        return
+    
+    if storage.thread and storage.over_quota(user_id):
+        await update.message.reply_text(
+            f"💽 Storage quota exceeded ({format_storage(user_id)}).\n"
+            f"Delete a bot or free up space before uploading."
+        )
+        return
+    
     max_bots = Config.PREMIUM_MAX_BOTS if user[2] else Config.MAX_FREE_BOTS
     
     if len(user_bots) >= max_bots:
@@ -702,6 +3394,7 @@ async def handle_file_upload(update: Update, context: ContextTypes.DEFAULT_TYPE)
     except Exception as e:
         await progress_msg.edit_text(f"❌ Upload error: {str(e)}")
 
+@metrics.timed('handler_seconds', handler='my_bots_command')
 async def my_bots_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user's hosted bots"""
     user_id = update.effective_user.id
@@ -722,6 +3415,7 @@ async def my_bots_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         status_emoji = {
             'running': '🟢',
             'stopped': '🔴',
+            'hibernated': '💤',
             'error': '⚠️'
         }.get(status, '⚪')
         
@@ -740,6 +3434,7 @@ async def my_bots_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='Markdown'
     )
 
+@metrics.timed('handler_seconds', handler='install_module_command')
 async def install_module_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Install module for a bot: /install <bot_id> <module_name>"""
     if len(context.args) < 2:
@@ -761,39 +3456,42 @@ async def install_module_command(update: Update, context: ContextTypes.DEFAULT_T
     
     progress = await update.message.reply_text(f"📦 Installing `{module_name}`...")
     
-    result = bot_manager.install_module(bot_id, module_name)
+    result = await asyncio.get_running_loop().run_in_executor(None, bot_manager.install_module, bot_id, module_name)
     
     await progress.edit_text(
         result['message'] + ("\n\n```\n" + result.get('output', result.get('error', ''))[:500] + "\n```" if result.get('output') or result.get('error') else ""),
         parse_mode='Markdown'
     )
 
+@metrics.timed('handler_seconds', handler='callback_handler')
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all inline keyboard callbacks"""
     query = update.callback_query
     await query.answer()
     
     data = query.data
+    # Manager calls spawn processes or go over HTTP to a node, keep them off the event loop
+    loop = asyncio.get_running_loop()
     
     if data.startswith("start_"):
         bot_id = data.split("_")[1]
         bot = db.get_bot(bot_id)
-        result = bot_manager.start_bot(bot_id, bot[4], bot[3])
+        result = await loop.run_in_executor(None, bot_manager.start_bot, bot_id, bot[4], bot[3])
         await query.edit_message_text(result['message'])
         
     elif data.startswith("stop_"):
         bot_id = data.split("_")[1]
-        result = bot_manager.stop_bot(bot_id)
+        result = await loop.run_in_executor(None, bot_manager.stop_bot, bot_id)
         await query.edit_message_text(result['message'])
         
     elif data.startswith("restart_"):
         bot_id = data.split("_")[1]
-        result = bot_manager.restart_bot(bot_id)
+        result = await loop.run_in_executor(None, bot_manager.restart_bot, bot_id)
         await query.edit_message_text(result['message'])
         
     elif data.startswith("stats_"):
         bot_id = data.split("_")[1]
-        stats = bot_manager.get_bot_stats(bot_id)
+        stats = await loop.run_in_executor(None, bot_manager.get_bot_stats, bot_id)
         
         if stats:
             message = f"""
@@ -805,13 +3503,25 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📍 **Status:** {stats['status']}
             """
         else:
-            message = "❌ Bot is not running!"
+            message = "❌ Bot is not running!\n"
+        
+        bot = db.get_bot(bot_id)
+        if bot and storage.thread:
+            message += f"💽 **Disk:** {storage.usage(bot[1], bot_id) / 1024 / 1024:.1f} MB\n"
+            message += f"🗄 **Account Storage:** {format_storage(bot[1])}\n"
+        
+        errors = db.get_bot_errors(bot_id)
+        if errors and errors[0]:
+            message += f"\n⚠️ **Errors:** {errors[0]}"
+            if errors[1]:
+                last_line = [line for line in errors[1].splitlines() if line.strip()][-1].replace('`', "'")
+                message += f", last at {errors[2][:19].replace('T', ' ')}\n```\n{last_line[:300]}\n```"
         
         await query.edit_message_text(message, parse_mode='Markdown')
         
     elif data.startswith("logs_"):
         bot_id = data.split("_")[1]
-        logs = bot_manager.get_bot_logs(bot_id, lines=20)
+        logs = await loop.run_in_executor(None, bot_manager.get_bot_logs, bot_id, 20)
         
         log_text = "📝 **Recent Logs:**\n\n```\n" + "\n".join(logs[-20:]) + "\n```"
         await query.edit_message_text(log_text[:4000], parse_mode='Markdown')
@@ -821,7 +3531,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         bot = db.get_bot(bot_id)
         
         if bot:
-            stats = bot_manager.get_bot_stats(bot_id)
+            stats = await loop.run_in_executor(None, bot_manager.get_bot_stats, bot_id)
             
             message = f"""
 🤖 **{bot[2]}**
@@ -831,7 +3541,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📍 **Status:** {bot[5].upper()}
 
 🕐 **Created:** {bot[6][:10]}
-🔄 **Auto-Restart:** {'✅ Enabled' if bot[13] else '❌ Disabled'}
+🔄 **Auto-Restart:** {'✅ Enabled' if bot[12] else '❌ Disabled'}
             """
             
             if stats:
@@ -843,8 +3553,121 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=BotUI.bot_actions_keyboard(bot_id),
                 parse_mode='Markdown'
             )
+    
+    elif data == "admin_stats":
+        if query.from_user.id not in Config.ADMIN_IDS:
+            return
+        
+        mem = psutil.virtual_memory()
+        message = f"""
+📊 **System Stats**
+
+🖥 **CPU:** {psutil.cpu_percent(interval=None):.1f}% ({psutil.cpu_count()} cores)
+💾 **RAM:** {mem.used / 1024 / 1024:.0f} / {mem.total / 1024 / 1024:.0f} MB
+🤖 **Running Bots:** {len(bot_manager.processes)}
+        """
+        
+        if not isinstance(bot_manager, ClusterController):
+            hibernation = bot_manager.hibernation_stats()
+            message += f"\n💤 **Hibernated:** {hibernation['frozen']} frozen, {hibernation['stopped']} stopped\n"
+            if hibernation['wakeups']:
+                message += f"⏰ **Wake-up:** p50 {hibernation['wake_p50'] * 1000:.0f} ms, p95 {hibernation['wake_p95'] * 1000:.0f} ms\n"
+        
+        if isinstance(bot_manager, ClusterController):
+            for url, node in bot_manager.nodes.items():
+                message += f"\n🛰 **{node.get('node_id', url)}**\n"
+                message += format_core_occupancy(node.get('cores', []))
+        else:
+            message += "\n🧩 **Core Occupancy:**\n"
+            message += format_core_occupancy(bot_manager.core_placer.occupancy())
+        
+        if not isinstance(bot_manager, ClusterController):
+            archive = bot_manager.logs.stats()
+            ratio = archive['raw_bytes'] / archive['bytes'] if archive['bytes'] else 0
+            message += f"\n📜 **Log Archive:** {archive['lines']:,} lines in {archive['segments']} segments, "
+            message += f"{archive['bytes'] / 1024 / 1024:.1f} MB ({ratio:.1f}x compressed)\n"
+        
+        if storage.thread:
+            summary = storage.summary()
+            message += f"\n💽 **Storage:** {summary['total_bytes'] / 1024 / 1024:.1f} MB across {summary['bots']} bots\n"
+            message += f"├ Watches: {summary['watches']}" + ("" if summary['inotify'] else " (inotify off, scanning)") + "\n"
+            message += f"├ Scan-only bots: {summary['unwatched']}\n"
+            message += f"├ Users over quota: {summary['over_quota']}\n"
+            for user_id, used in summary['top_users']:
+                message += f"├ `{user_id}`: {used / 1024 / 1024:.1f} MB\n"
+            message += f"└ Last full rescan: {storage.last_reconcile:%H:%M}\n" if storage.last_reconcile else ""
+        
+        if metrics.enabled:
+            message += format_metrics_summary()
+        
+        await query.edit_message_text(message[:4000], parse_mode='Markdown')
+    
+    elif data == "admin_perf":
+        if query.from_user.id not in Config.ADMIN_IDS:
+            return
+        
+        await query.edit_message_text(format_loop_report(), parse_mode='Markdown')
+
+def format_loop_report():
+    """Event-loop lag, recent stalls with their stacks and the last profiler run"""
+    lag = loop_monitor.lag_stats()
+    message = "🐢 **Event Loop Performance**\n\n"
+    if not loop_monitor.loop_thread:
+        message += "└ Monitor not running\n"
+    else:
+        message += f"⏱ **Lag:** p50 {lag['p50'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, max {lag['max'] * 1000:.0f} ms\n"
+        message += f"🚧 **Stalls > {loop_monitor.threshold * 1000:.0f} ms:** {lag['stalls']}\n"
+    
+    for stall in list(loop_monitor.stalls)[-3:][::-1]:
+        frames = "\n".join(f"{name} ({file}:{line})" for file, line, name in stall['frames'][-6:])
+        message += f"\n🕒 {stall['time']:%H:%M:%S}, blocked {stall['seconds']:.2f}s\n```\n{frames.replace('`', '')}\n```\n"
+    
+    profile = loop_monitor.last_profile
+    if profile:
+        top = "\n".join(f"{count:>5} {name}" for name, count in profile['top'][:8])
+        message += f"\n🔬 **Last Profile:** {profile['time']:%H:%M:%S}, {profile['seconds']}s, "
+        message += f"{profile['samples']} samples, loop busy {profile['loop_busy']:.0%}\n"
+        message += f"```\n{top.replace('`', '') or 'idle'}\n```\n"
+    message += f"\n📄 Log: `{Config.PERF_LOG_PATH}`\nUse /profile <seconds> to sample stacks."
+    return message[:4000]
+
+def format_storage(user_id):
+    """'used / quota MB' for a user's bots"""
+    return f"{storage.usage(user_id) / 1024 / 1024:.1f} / {storage.quota(user_id) / 1024 / 1024:.0f} MB"
+
+def format_metrics_summary():
+    """Slowest handlers plus database, spawn and pip latency from the metrics registry"""
+    def line(row, label):
+        return f"`{label}`: {row['count']}x, avg {row['mean'] * 1000:.0f} ms, p95 {row['p95'] * 1000:.0f} ms\n"
+    
+    message = "\n⏱ **Slowest Handlers (p95):**\n"
+    handlers = metrics.summary('handler_seconds')[:5]
+    message += "".join("├ " + line(row, row['labels']['handler']) for row in handlers) or "└ No data yet\n"
+    
+    queries = metrics.summary('db_query_seconds')
+    if queries:
+        count = sum(row['count'] for row in queries)
+        mean = sum(row['mean'] * row['count'] for row in queries) / count
+        message += f"\n🗄 **DB Queries:** {count}x, avg {mean * 1000:.2f} ms, slowest `{queries[0]['labels']['query']}`\n"
+    for name, label in (('bot_spawn_seconds', '🚀 Spawns'), ('pip_install_seconds', '📦 Pip Installs'),
+                        ('validation_seconds', '🔍 Validations')):
+        for row in metrics.summary(name):
+            tag = ' '.join(row['labels'].values())
+            message += f"{label}{' ' + tag if tag else ''}: {row['count']}x, p95 {row['p95'] * 1000:.0f} ms\n"
+    return message
+
+def format_core_occupancy(rows):
+    """Render per-core occupancy rows as one line per core"""
+    if not rows:
+        return "└ Core pinning disabled\n"
+    lines = []
+    for row in rows:
+        label = '🔒 control' if row['reserved'] else f"{row['bots']} bots, ~{row['bot_load']:.0f}% est"
+        lines.append(f"Core {row['core']}: {row['cpu_percent']:.0f}% ({label})")
+    return "".join(f"├ {line}\n" for line in lines[:-1]) + f"└ {lines[-1]}\n"
 
 # Admin Commands
+@metrics.timed('handler_seconds', handler='admin_panel')
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Advanced admin panel [web:5]"""
     if update.effective_user.id not in Config.ADMIN_IDS:
@@ -884,6 +3707,114 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='Markdown'
     )
 
+async def run_bulk_operation(message, action, bot_ids):
+    """Run a bulk start/stop/restart off the event loop, editing one message with progress"""
+    operation = {'start': bot_manager.start_bots, 'stop': bot_manager.stop_bots, 'restart': bot_manager.restart_bots}[action]
+    progress = {'phase': action, 'done': 0, 'total': len(bot_ids)}
+    
+    def report(phase, done, total):
+        progress.update(phase=phase, done=done, total=total)
+    
+    task = asyncio.get_running_loop().run_in_executor(None, lambda: operation(bot_ids, progress=report))
+    shown = None
+    while not task.done():
+        text = f"⏳ Bulk {action}: {progress['phase']} {progress['done']}/{progress['total']}"
+        if text != shown:
+            await message.edit_text(text)
+            shown = text
+        await asyncio.wait([task], timeout=1.5)
+    result = task.result()
+    
+    summary = f"✅ Bulk {action} complete! ({len(bot_ids)} bots)\n"
+    if 'stopped' in result:
+        summary += f"⏹ Stopped: {len(result['stopped'])}\n💀 Force killed: {len(result['killed'])}\n"
+    if 'started' in result:
+        summary += f"▶️ Started: {len(result['started'])}\n❌ Failed: {len(result['failed'])}\n"
+    await message.edit_text(summary)
+    return result
+
+@metrics.timed('handler_seconds', handler='bulk_command')
+async def bulk_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Bulk lifecycle: /bulk <start|stop|restart> [all|running|user <user_id>]"""
+    user_id = update.effective_user.id
+    is_admin = user_id in Config.ADMIN_IDS
+    
+    if len(context.args) == 0 or context.args[0] not in ('start', 'stop', 'restart'):
+        usage = "❌ **Usage:** `/bulk <start|stop|restart>`"
+        if is_admin:
+            usage += " `[all|running|user <user_id>]`"
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+    
+    action = context.args[0]
+    target = context.args[1] if len(context.args) > 1 else None
+    
+    # Owners act on their own bots, admins can pick any target
+    if not is_admin or target is None:
+        bots = db.get_user_bots(user_id)
+    elif target == 'all':
+        bots = db.get_all_bots()
+    elif target == 'running':
+        bots = db.get_bots_by_status('running', 'hibernated')
+    elif target == 'user' and len(context.args) > 2 and context.args[2].isdigit():
+        bots = db.get_user_bots(int(context.args[2]))
+    else:
+        await update.message.reply_text("❌ Target must be all, running or user <user_id>")
+        return
+    
+    if action == 'start':
+        user = db.get_user(user_id)
+        if user and user[4]:
+            await update.message.reply_text("🚫 Your account is banned from hosting bots.")
+            return
+    
+    if not bots:
+        await update.message.reply_text("📭 No bots to act on.")
+        return
+    
+    if is_admin and target:
+        db.log_admin_action(user_id, f'bulk_{action}', details=' '.join(context.args[1:]))
+    
+    progress = await update.message.reply_text(f"⏳ Bulk {action}: 0/{len(bots)}")
+    await run_bulk_operation(progress, action, [bot[0] for bot in bots])
+
+@metrics.timed('handler_seconds', handler='ban_command')
+async def ban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ban a user and stop all their bots: /ban <user_id>"""
+    if update.effective_user.id not in Config.ADMIN_IDS:
+        return
+    
+    if len(context.args) == 0 or not context.args[0].isdigit():
+        await update.message.reply_text("❌ Usage: /ban <user_id>")
+        return
+    
+    target_user_id = int(context.args[0])
+    db.set_user_banned(target_user_id, True)
+    db.log_admin_action(update.effective_user.id, 'ban', target_user_id=target_user_id)
+    
+    progress = await update.message.reply_text(f"🚫 User {target_user_id} banned, stopping bots...")
+    bot_ids = [bot[0] for bot in db.get_user_bots(target_user_id)]
+    if bot_ids:
+        await run_bulk_operation(progress, 'stop', bot_ids)
+    else:
+        await progress.edit_text(f"🚫 User {target_user_id} banned (no bots).")
+
+@metrics.timed('handler_seconds', handler='unban_command')
+async def unban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Lift a ban: /unban <user_id>"""
+    if update.effective_user.id not in Config.ADMIN_IDS:
+        return
+    
+    if len(context.args) == 0 or not context.args[0].isdigit():
+        await update.message.reply_text("❌ Usage: /unban <user_id>")
+        return
+    
+    target_user_id = int(context.args[0])
+    db.set_user_banned(target_user_id, False)
+    db.log_admin_action(update.effective_user.id, 'unban', target_user_id=target_user_id)
+    await update.message.reply_text(f"✅ User {target_user_id} unbanned.")
+
+@metrics.timed('handler_seconds', handler='broadcast_command')
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast message to all users"""
     if update.effective_user.id not in Config.ADMIN_IDS:
@@ -910,13 +3841,181 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(f"📢 Broadcast complete!\n✅ Success: {success}\n❌ Failed: {failed}")
 
+@metrics.timed('handler_seconds', handler='nodes_command')
+async def nodes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show cluster nodes with capacity and placed bots"""
+    if update.effective_user.id not in Config.ADMIN_IDS:
+        return
+    
+    if not isinstance(bot_manager, ClusterController):
+        await update.message.reply_text("🖥 Single-host mode, no cluster agents configured.")
+        return
+    
+    message = "🛰 **Cluster Nodes:**\n\n"
+    for url, node in bot_manager.nodes.items():
+        state = '🔴 DOWN' if node.get('down') else '🟡 DRAINING' if node.get('draining') else '🟢 UP'
+        bots = sum(1 for u in bot_manager.placements.values() if u == url)
+        message += f"{state} **{node.get('node_id', url)}**\n"
+        message += f"├ URL: `{url}`\n"
+        if 'cpu_count' in node:
+            free_memory, free_cpu = PlacementScheduler.headroom(node)
+            message += f"├ Free: {free_memory:.0f} MB / {free_cpu:.1f} cores\n"
+        message += f"└ Bots: {bots}\n\n"
+    
+    await update.message.reply_text(message, parse_mode='Markdown')
+
+@metrics.timed('handler_seconds', handler='drain_command')
+async def drain_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Drain a node and migrate its bots: /drain <node_url>"""
+    if update.effective_user.id not in Config.ADMIN_IDS:
+        return
+    
+    if not isinstance(bot_manager, ClusterController):
+        await update.message.reply_text("🖥 Single-host mode, no cluster agents configured.")
+        return
+    
+    if len(context.args) == 0 or context.args[0] not in bot_manager.agents:
+        await update.message.reply_text("❌ Usage: /drain <node_url> (see /nodes)")
+        return
+    
+    url = context.args[0]
+    progress = await update.message.reply_text(f"🟡 Draining `{url}`...", parse_mode='Markdown')
+    moved = await asyncio.get_running_loop().run_in_executor(None, bot_manager.drain_node, url)
+    db.log_admin_action(update.effective_user.id, 'drain_node', details=url)
+    
+    migrated = sum(1 for _, ok in moved if ok)
+    await progress.edit_text(f"✅ Node drained!\n🔀 Migrated: {migrated}\n❌ Failed: {len(moved) - migrated}")
+
+@metrics.timed('handler_seconds', handler='logs_command')
+async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Search a bot's archived output: /logs <bot_id> [query]"""
+    user_id = update.effective_user.id
+    if len(context.args) == 0:
+        await update.message.reply_text("❌ Usage: /logs <bot_id> [query]\nWithout a query shows the latest lines, 'word*' matches a prefix.")
+        return
+    
+    bot_id = context.args[0]
+    bot = db.get_bot(bot_id)
+    if not bot or (bot[1] != user_id and user_id not in Config.ADMIN_IDS):
+        await update.message.reply_text("❌ Bot not found!")
+        return
+    
+    query = ' '.join(context.args[1:]).replace('`', '')
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    if query:
+        matches = await loop.run_in_executor(None, bot_manager.search_logs, bot_id, query, 20)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not matches:
+            await update.message.reply_text(f"🔍 No matches for `{query}` ({elapsed:.0f} ms)", parse_mode='Markdown')
+            return
+        lines = [f"{m['time'][5:]}{'!' if m['stream'] == 'E' else ' '} {m['text'][:200]}" for m in reversed(matches)]
+        header = f"🔍 **{len(matches)} matches** for `{query}` in {elapsed:.0f} ms (newest last)\n\n"
+    else:
+        lines = await loop.run_in_executor(None, bot_manager.get_bot_logs, bot_id, 30)
+        header = f"📝 **Latest output of** `{bot_id}`\n\n"
+    
+    body = "\n".join(lines).replace('`', "'")[-3500:]
+    await update.message.reply_text(f"{header}```\n{body}\n```", parse_mode='Markdown')
+
+@metrics.timed('handler_seconds', handler='hibernate_command')
+async def hibernate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Let an idle bot be hibernated: /hibernate <bot_id> <on|off>"""
+    if len(context.args) < 2 or context.args[1] not in ('on', 'off'):
+        await update.message.reply_text("❌ Usage: /hibernate <bot_id> <on|off>")
+        return
+    
+    bot_id = context.args[0]
+    bot = db.get_bot(bot_id)
+    if not bot or bot[1] != update.effective_user.id:
+        await update.message.reply_text("❌ Bot not found or you don't have permission!")
+        return
+    
+    enabled = context.args[1] == 'on'
+    db.set_bot_hibernation(bot_id, enabled)
+    if not enabled:
+        await update.message.reply_text(f"✅ `{bot_id}` will keep running while idle.", parse_mode='Markdown')
+    elif not Config.HIBERNATE_MODE:
+        await update.message.reply_text("ℹ️ Saved, but hibernation is turned off on this platform.")
+    else:
+        await update.message.reply_text(
+            f"💤 `{bot_id}` may now be hibernated after {Config.HIBERNATE_IDLE_SECONDS // 60} idle minutes.\n\n"
+            "⚠️ Incoming messages do not wake it: it stays silent to its users until you press Start. "
+            "On a cluster this applies from the bot's next start.",
+            parse_mode='Markdown'
+        )
+
+@metrics.timed('handler_seconds', handler='profile_command')
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Sample every thread's stack for N seconds: /profile [seconds]"""
+    if update.effective_user.id not in Config.ADMIN_IDS:
+        return
+    
+    try:
+        seconds = int(context.args[0]) if context.args else 10
+    except ValueError:
+        seconds = 0
+    if not 1 <= seconds <= Config.PROFILE_MAX_SECONDS:
+        await update.message.reply_text(f"❌ Usage: /profile [seconds], 1-{Config.PROFILE_MAX_SECONDS}")
+        return
+    
+    progress = await update.message.reply_text(f"🔬 Profiling for {seconds}s...")
+    result = await asyncio.get_running_loop().run_in_executor(None, loop_monitor.profile, seconds)
+    if result is None:
+        await progress.edit_text("⏳ A profile is already running, try again shortly.")
+        return
+    
+    db.log_admin_action(update.effective_user.id, 'profile', details=f'{seconds}s')
+    await progress.edit_text(format_loop_report(), parse_mode='Markdown')
+
+def storage_quota_alert(application, loop, level, user_id, used, quota):
+    """Called from the accountant thread: alert the owner, stop their bots once the grace period ends"""
+    usage = f"{used / 1024 / 1024:.1f} / {quota / 1024 / 1024:.0f} MB"
+    if level == 'warn':
+        text = f"⚠️ **Storage almost full:** {usage} used by your bots."
+    elif level == 'over':
+        text = (f"🚨 **Storage quota exceeded:** {usage}\n\n"
+                f"Free up space within {Config.STORAGE_GRACE_SECONDS // 60} minutes or your bots will be stopped.")
+    else:
+        running = [bot[0] for bot in db.get_user_bots(user_id) if bot[5] in ('running', 'hibernated')]
+        if running:
+            bot_manager.stop_bots(running)
+        text = f"⛔ **Storage quota still exceeded:** {usage}\n\nStopped {len(running)} bot(s). Free up space to start them again."
+    asyncio.run_coroutine_threadsafe(
+        application.bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown'), loop)
+
+async def post_init(application):
+    """Runs inside the event loop once polling starts"""
+    loop = asyncio.get_running_loop()
+    if Config.LOOP_MONITOR_ENABLED:
+        loop_monitor.start(loop)
+    if Config.STORAGE_ACCOUNTING_ENABLED:
+        storage.on_quota = functools.partial(storage_quota_alert, application, loop)
+
 # Main function
 def main():
     """Start the bot"""
     print("🚀 Starting GADGET Bot Hosting Platform...")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     
-    application = Application.builder().token(Config.BOT_TOKEN).build()
+    if not Config.BOT_TOKEN:
+        print("❌ BOT_TOKEN is not set, export the token from @BotFather and start again")
+        sys.exit(1)
+    
+    init_control_plane()
+    if not Config.CLUSTER_AGENTS:
+        bot_manager.core_placer.pin_control_plane()
+    
+    builder = Application.builder().token(Config.BOT_TOKEN).post_init(post_init)
+    if Config.BOT_API_BASE_URL:
+        builder = builder.base_url(Config.BOT_API_BASE_URL)
+    if Config.BOT_API_FILE_URL:
+        builder = builder.base_file_url(Config.BOT_API_FILE_URL)
+    application = builder.build()
+    
+    if Config.METRICS_PORT:
+        metrics.serve(Config.METRICS_PORT)
+        print(f"📈 Metrics on {Config.METRICS_HOST}:{Config.METRICS_PORT}/metrics")
     
     # Command handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -924,6 +4023,14 @@ def main():
     application.add_handler(CommandHandler("install", install_module_command))
     application.add_handler(CommandHandler("admin", admin_panel))
     application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("nodes", nodes_command))
+    application.add_handler(CommandHandler("drain", drain_command))
+    application.add_handler(CommandHandler("bulk", bulk_command))
+    application.add_handler(CommandHandler("ban", ban_command))
+    application.add_handler(CommandHandler("unban", unban_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("logs", logs_command))
+    application.add_handler(CommandHandler("hibernate", hibernate_command))
     
     # Message handlers
     application.add_handler(MessageHandler(filters.Document.ALL, handle_file_upload))
@@ -938,5 +4045,20 @@ def main():
     # Start bot
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
+def run_agent(argv):
+    """Run a node agent: python3 main.py agent [port] [node_id]"""
+    port = int(argv[0]) if len(argv) > 0 else Config.AGENT_PORT
+    node_id = argv[1] if len(argv) > 1 else None
+    try:
+        agent = NodeAgent(node_id=node_id, port=port)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    agent.manager.core_placer.pin_control_plane()
+    agent.serve_forever()
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'agent':
+        run_agent(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,127 @@
+# test_cluster.py - ClusterController failover against in-process fake agents
+import os
+import sys
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+class FakeAgent:
+    """Answers the AgentClient calls ClusterController makes, or fails them while down"""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.up = True
+        self.bots = {}
+
+    def _check(self):
+        if not self.up:
+            raise requests.ConnectionError(f"{self.node_id} is down")
+
+    def get(self, path, **params):
+        self._check()
+        if path == '/status':
+            return {
+                'node_id': self.node_id,
+                'draining': False,
+                'cpu_count': 4,
+                'cpu_percent': 0.0,
+                'memory_total_mb': 8192,
+                'memory_available_mb': 8192,
+                'bots': {bot_id: {'pid': 1, 'cpu_percent': 0.0, 'memory_mb': 0} for bot_id in self.bots},
+                'hibernated': {},
+                'cores': {}
+            }
+        raise AssertionError(f"Unexpected GET {path}")
+
+    def post(self, path, payload=None):
+        self._check()
+        parts = [p for p in path.split('/') if p]
+        if parts == ['bots', 'start']:
+            self.bots[payload['bot_id']] = payload
+            return {'success': True, 'pid': 1}
+        if len(parts) == 3 and parts[2] == 'stop':
+            return {'success': self.bots.pop(parts[1], None) is not None}
+        raise AssertionError(f"Unexpected POST {path}")
+
+
+class ClusterFailoverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.poll_seconds = main.Config.CLUSTER_POLL_SECONDS
+        main.Config.CLUSTER_POLL_SECONDS = 3600  # The test drives check_nodes() itself
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # BotManager keeps its logs and spools relative to the working directory
+        self.db = main.Database(os.path.join(self.tmp.name, 'cluster.db'))
+        self.db.add_hosted_bot('bot1', 1, 'Bot 1', 'python', '/srv/bots/1/bot1/bot.py')
+        self.controller = main.ClusterController(self.db, [])
+        self.a, self.b = FakeAgent('a'), FakeAgent('b')
+        self.controller.agents = {'http://a': self.a, 'http://b': self.b}
+        self.controller.poll_nodes()
+
+    def tearDown(self):
+        main.Config.CLUSTER_POLL_SECONDS = self.poll_seconds
+        self.db.conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _host(self):
+        return self.controller.placements.get('bot1')
+
+    def test_bot_lost_with_its_node_is_placed_elsewhere(self):
+        self.assertTrue(self.controller.start_bot('bot1', '/srv/bots/1/bot1/bot.py')['success'])
+        first = self._host()
+        dead, survivor = (self.a, self.b) if first == 'http://a' else (self.b, self.a)
+
+        dead.up = False
+        for _ in range(main.Config.CLUSTER_DOWN_AFTER):
+            self.controller.check_nodes()
+
+        self.assertNotEqual(self._host(), first)
+        self.assertIn('bot1', survivor.bots)
+        self.assertEqual(self.db.get_bot('bot1')[5], 'running')
+
+    def test_bot_without_auto_restart_is_marked_stopped(self):
+        self.db.conn.execute("UPDATE hosted_bots SET auto_restart = 0 WHERE bot_id = 'bot1'")
+        self.db.conn.commit()
+        self.controller.start_bot('bot1', '/srv/bots/1/bot1/bot.py')
+        dead = self.a if self._host() == 'http://a' else self.b
+
+        dead.up = False
+        for _ in range(main.Config.CLUSTER_DOWN_AFTER):
+            self.controller.check_nodes()
+
+        self.assertIsNone(self._host())
+        self.assertEqual(self.db.get_bot('bot1')[5], 'stopped')
+
+    def test_returning_node_stops_its_stale_copy(self):
+        self.controller.start_bot('bot1', '/srv/bots/1/bot1/bot.py')
+        first = self._host()
+        partitioned = self.a if first == 'http://a' else self.b
+
+        partitioned.up = False
+        for _ in range(main.Config.CLUSTER_DOWN_AFTER):
+            self.controller.check_nodes()
+        moved_to = self._host()
+        partitioned.up = True  # Comes back still running its copy
+        self.controller.check_nodes()
+
+        self.assertEqual(self._host(), moved_to)
+        self.assertNotIn('bot1', partitioned.bots)
+
+    def test_agent_reconcile_leaves_dead_bots_to_the_controller(self):
+        self.db.update_bot_status('bot1', 'running', 2 ** 22 + 1)  # No such pid
+        manager = main.BotManager(self.db, restart_lost=False)
+        manager.reconcile_thread.join(10)
+
+        self.assertNotIn('bot1', manager.processes)
+        self.assertEqual(self.db.get_bot('bot1')[5], 'stopped')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# zygote.py - Pre-warmed Python Fork Server
+# Runs in its own clean interpreter (main.py starts threads on import, which must never be forked):
+#   python3 zygote.py <socket_path> [module ...]
+import os
+import sys
+import json
+import signal
+import socket
+import resource
+import traceback
+import importlib
+import runpy
+
+
+def preload(modules):
+    """Import common bot libraries once so forked bots share them copy-on-write"""
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            pass  # Not installed here, bots importing it pay the cost themselves
+    return loaded
+
+
+def run_bot(request, fds):
+    """Forked child: become the bot process described by the request"""
+    os.setsid()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in [devnull] + fds:
+        os.close(fd)
+
+    for name, (soft, hard) in request.get('rlimits', {}).items():
+        resource.setrlimit(getattr(resource, name), (soft, hard))
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = [request['file_path']]
+    sys.path[0] = os.path.dirname(request['file_path'])
+    sys.stdout = os.fdopen(1, 'w', buffering=1)
+    sys.stderr = os.fdopen(2, 'w', buffering=1)
+
+    code = 0
+    try:
+        runpy.run_path(request['file_path'], run_name='__main__')
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException as e:
+        # Hide the zygote and runpy frames, the bot's own file is where its traceback starts
+        tb = e.__traceback__
+        while tb and tb.tb_frame.f_code.co_filename != request['file_path']:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+
+def serve(socket_path, modules):
+    preload(modules)
+
+    # Bots are reaped automatically, the controller tracks them by pid and create time
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    server.settimeout(1)
+    parent = os.getppid()
+
+    while True:
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            if os.getppid() != parent:
+                break  # Controller is gone, a restarted one boots its own zygote
+            continue
+        conn.settimeout(None)
+        try:
+            data, fds, _, _ = socket.recv_fds(conn, 1024 * 1024, 2)
+            request = json.loads(data)
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                conn.close()
+                run_bot(request, fds)
+            for fd in fds:
+                os.close(fd)
+            conn.sendall(json.dumps({'pid': pid}).encode())
+        except Exception as e:
+            try:
+                conn.sendall(json.dumps({'error': str(e)}).encode())
+            except OSError:
+                pass
+        finally:
+            conn.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], sys.argv[2:])